@@ -5,6 +5,7 @@ Updated for Django 5.2 and modern best practices.
 
 from pathlib import Path
 import os
+import sys
 from dotenv import load_dotenv
 import dj_database_url
 
@@ -49,10 +50,15 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    # Removes itself unless FLEET_PROFILING is on
+    'fleet_manager.profiling.ProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'capstone.urls'
 
+# With no 'loaders' option, Django wraps the filesystem and app directories loaders
+# in the cached loader, so each process compiles a template once (runserver reloads
+# changed templates in DEBUG).
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
@@ -64,6 +70,8 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                # Swaps the CSRF token for a placeholder in pages being cached
+                'fleet_manager.page_cache.csrf_placeholder',
             ],
         },
     },
@@ -88,6 +96,33 @@ DATABASES = {
 }
 
 
+# --- Cache ---
+# The cached pages, list counts and summaries are invalidated through the cache
+# itself, so every process must share it: 'file' by default, or 'db' (run
+# `python manage.py createcachetable` first). Tests get a per-process 'locmem'
+# cache, so they never read entries left by the server or by an earlier run.
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'locmem' if sys.argv[1:2] == ['test'] else 'file')
+
+CACHE_BACKENDS = {
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'fleet-manager',
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.getenv('CACHE_LOCATION', str(BASE_DIR / 'cache')),
+    },
+    'db': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': os.getenv('CACHE_LOCATION', 'fleet_manager_cache'),
+    },
+}
+
+CACHES = {
+    'default': CACHE_BACKENDS[CACHE_BACKEND],
+}
+
+
 # --- Custom User Model ---
 AUTH_USER_MODEL = 'fleet_manager.User'
 
@@ -119,7 +154,9 @@ MEDIA_ROOT = BASE_DIR / 'media'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # --- Email Configuration ---
-EMAIL_BACKEND = "django.core.mail.backends.smtp.EmailBackend"
+# e.g. django.core.mail.backends.filebased.EmailBackend (with EMAIL_FILE_PATH) or .locmem.EmailBackend for testing
+EMAIL_BACKEND = os.getenv('EMAIL_BACKEND', "django.core.mail.backends.smtp.EmailBackend")
+EMAIL_FILE_PATH = os.getenv('EMAIL_FILE_PATH', BASE_DIR / 'sent_emails')
 EMAIL_HOST = os.getenv('EMAIL_HOST', 'smtp.sendgrid.net')
 EMAIL_PORT = int(os.getenv('EMAIL_PORT', 587))
 EMAIL_USE_TLS = os.getenv('EMAIL_USE_TLS', 'True') == 'True'
@@ -127,12 +164,40 @@ EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER')
 EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD')
 DEFAULT_FROM_EMAIL = os.getenv('DEFAULT_FROM_EMAIL', 'admin@example.com')
 
+# --- Licence Expiry Reminders ---
+EXPIRY_REMINDER_FROM_EMAIL = os.getenv('EXPIRY_REMINDER_FROM_EMAIL', 'admin@lingode.co.za')
+# Fleet group (the fleet number prefix, e.g. "SIM" for "SIM 001") -> digest recipients.
+# Groups without an entry go to "default".
+EXPIRY_REMINDER_RECIPIENTS = {
+    'default': os.getenv('EXPIRY_REMINDER_RECIPIENTS', 'info@lingode.co.za').split(','),
+}
+
+# --- Request Profiling (fleet_manager/profiling.py) ---
+FLEET_PROFILING = os.getenv('FLEET_PROFILING', 'False') == 'True'
+# Fraction of profiled requests that also run under cProfile, e.g. 0.01
+FLEET_PROFILING_SAMPLE_RATE = float(os.getenv('FLEET_PROFILING_SAMPLE_RATE', '0'))
+FLEET_PROFILING_DIR = os.getenv('FLEET_PROFILING_DIR', BASE_DIR / 'profiles')
+# A statement run this many times in one request is logged as a likely N+1
+FLEET_PROFILING_DUPLICATE_THRESHOLD = int(os.getenv('FLEET_PROFILING_DUPLICATE_THRESHOLD', '5'))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'fleet_manager.profiling': {'handlers': ['console'], 'level': 'INFO', 'propagate': False},
+    },
+}
+
 # --- Django Q (Task Queue) Configuration ---
 Q_CLUSTER = {
     'name': 'DjangoQCluster',
     'workers': 2,
     'recycle': 500,
     'timeout': 60,
+    'retry': 720,  # Longer than the slowest task timeout (background exports)
     'queue_limit': 50,
     'bulk': 10,
     'orm': 'default',
@@ -1,6 +1,8 @@
-from django.contrib import admin
+from django.contrib import admin, messages
 from django.contrib.auth.admin import UserAdmin
-from .models import Asset, PurchaseDetails, FinancingDetails, LicensingDetails, User
+from django.db import transaction
+from .bulk import MAX_BULK_ITEMS, BulkEditError, bulk_edit_assets
+from .models import Asset, PurchaseDetails, FinancingDetails, LicensingDetails, User, ExportJob, ExpiryReminder
 
 admin.site.register(User, UserAdmin)
 
@@ -9,6 +11,35 @@ class AssetAdmin(admin.ModelAdmin):
     list_display = ('year', 'make', 'model', 'vehicle_type', 'status', 'vin')
     list_filter = ('status', 'vehicle_type', 'year')
     search_fields = ('vin', 'make', 'model')
+    actions = ['mark_inactive', 'mark_active']
+
+    def set_status(self, request, queryset, status):
+        ids = list(queryset.values_list('pk', flat=True))
+        results = []
+        try:
+            # One transaction, so a failing batch also undoes the batches before it
+            with transaction.atomic():
+                for start in range(0, len(ids), MAX_BULK_ITEMS):
+                    results += bulk_edit_assets(
+                        [{'id': pk, 'status': status} for pk in ids[start:start + MAX_BULK_ITEMS]])
+        except BulkEditError as e:
+            failed = [result for result in e.results if result['status'] != 'not_applied']
+            self.message_user(
+                request,
+                f"No assets were marked {status}: {len(failed)} of the selected assets could not be changed.",
+                level=messages.ERROR,
+            )
+            return
+        updated = sum(result['status'] == 'updated' for result in results)
+        self.message_user(request, f"{updated} assets marked {status}; {len(results) - updated} were already {status}.")
+
+    @admin.action(description='Mark selected assets Inactive')
+    def mark_inactive(self, request, queryset):
+        self.set_status(request, queryset, 'Inactive')
+
+    @admin.action(description='Mark selected assets Active')
+    def mark_active(self, request, queryset):
+        self.set_status(request, queryset, 'Active')
 
 
 @admin.register(PurchaseDetails)
@@ -33,3 +64,17 @@ class LicensingDetailsAdmin(admin.ModelAdmin):
                     'disc_fee', 'disc_expiry_date')
     list_filter = ('disc_expiry_date',)
     search_fields = ('reg_no', 'fleet_no')
+
+
+@admin.register(ExportJob)
+class ExportJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'vehicle_type', 'export_format', 'status',
+                    'rows_written', 'total_rows', 'created_by', 'created_at')
+    list_filter = ('status', 'export_format')
+
+
+@admin.register(ExpiryReminder)
+class ExpiryReminderAdmin(admin.ModelAdmin):
+    list_display = ('licence', 'disc_expiry_date', 'sent_at')
+    list_filter = ('disc_expiry_date',)
+    raw_id_fields = ('licence',)
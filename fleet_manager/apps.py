@@ -1,6 +1,13 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class FleetManagerConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'fleet_manager'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from .schedules import register_schedules
+
+        post_migrate.connect(register_schedules, sender=self)
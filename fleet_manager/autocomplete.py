@@ -0,0 +1,89 @@
+"""In-memory prefix index for typeahead lookups of VINs, registration and fleet numbers.
+
+Each process keeps a sorted list of normalised keys and answers prefix queries
+with bisect. The index is rebuilt from the database once it is older than
+REFRESH_SECONDS (or after a local write), by whichever request finds it stale
+first; other requests keep using the previous copy meanwhile.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+
+from .models import Asset, LicensingDetails
+
+REFRESH_SECONDS = 60
+
+AUTOCOMPLETE_FIELDS = ("vin", "reg_no", "fleet_no")
+
+
+def normalise(value):
+    """Upper-cases a value and drops spaces, so 'aa11 sm' matches 'AA11SM GP'."""
+    return "".join((value or "").split()).upper()
+
+
+class PrefixIndex:
+    def __init__(self, refresh_seconds=REFRESH_SECONDS):
+        self.refresh_seconds = refresh_seconds
+        # Field (None for all fields) -> (sorted keys, matching entries)
+        self.indexes = {}
+        self.built_at = None
+        self.version = "0"
+        self.lock = threading.Lock()
+
+    def build(self):
+        """Loads every VIN, reg_no and fleet_no with its asset id, sorted by normalised key."""
+        rows = [
+            (normalise(vin), "vin", vin, asset_id)
+            for asset_id, vin in Asset.objects.values_list("id", "vin").iterator()
+        ]
+        for asset_id, reg_no, fleet_no in LicensingDetails.objects.values_list(
+                "asset_id", "reg_no", "fleet_no").iterator():
+            if reg_no:
+                rows.append((normalise(reg_no), "reg_no", reg_no, asset_id))
+            if fleet_no:
+                rows.append((normalise(fleet_no), "fleet_no", fleet_no, asset_id))
+        rows.sort()
+
+        indexes = {None: ([row[0] for row in rows], rows)}
+        for field in AUTOCOMPLETE_FIELDS:
+            field_rows = [row for row in rows if row[1] == field]
+            indexes[field] = ([row[0] for row in field_rows], field_rows)
+
+        # Swapped in at once so lookups never see a half-built index
+        self.indexes = indexes
+        self.built_at = time.monotonic()
+        self.version = f"{int(time.time() * 1000):x}"
+
+    def is_stale(self):
+        return self.built_at is None or time.monotonic() - self.built_at > self.refresh_seconds
+
+    def invalidate(self):
+        self.built_at = None
+
+    def refresh_if_stale(self):
+        if not self.is_stale():
+            return
+        # Only the first build makes requests wait; later ones serve the old copy meanwhile
+        if self.lock.acquire(blocking=not self.indexes):
+            try:
+                if self.is_stale():
+                    self.build()
+            finally:
+                self.lock.release()
+
+    def lookup(self, prefix, limit=10, field=None):
+        """Returns up to ``limit`` (key, field, value, asset_id) entries whose key starts with ``prefix``."""
+        prefix = normalise(prefix)
+        if not prefix or field not in self.indexes:
+            return []
+
+        keys, entries = self.indexes[field]
+        start = bisect_left(keys, prefix)
+        end = start
+        while end < len(keys) and end - start < limit and keys[end].startswith(prefix):
+            end += 1
+        return entries[start:end]
+
+
+index = PrefixIndex()
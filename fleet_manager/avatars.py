@@ -0,0 +1,94 @@
+"""Resized avatar thumbnails of users' profile pictures.
+
+The navbar shows every signed-in user's avatar at 35px, so serving the original
+upload costs a full-size image download on every page. When a profile picture
+changes, signals.py queues tasks.make_avatar_thumbnails, which writes square
+AVATAR_SIZES thumbnails in WebP and JPEG. Thumbnail files are named after a hash
+of their contents, so a URL always serves the same bytes. The avatar_file view
+can therefore let browsers cache them for a year, and a new upload simply gets
+new URLs.
+"""
+
+import hashlib
+import re
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.urls import reverse
+from PIL import Image, ImageOps
+
+# Thumbnail edge lengths in pixels: the navbar avatar at 1x and 2x density
+AVATAR_SIZES = (36, 72)
+
+# Format -> (Pillow format, save options, file extension, content type)
+AVATAR_FORMATS = {
+    "webp": ("WEBP", {"quality": 80, "method": 6}, "webp", "image/webp"),
+    "jpeg": ("JPEG", {"quality": 85, "optimize": True, "progressive": True}, "jpg", "image/jpeg"),
+}
+
+AVATAR_CONTENT_TYPES = {extension: content_type for _, _, extension, content_type in AVATAR_FORMATS.values()}
+
+# Directory of the thumbnails in the default storage
+AVATAR_DIR = "avatars/"
+
+AVATAR_NAME_RE = re.compile(r"[0-9a-f]{16}\.(webp|jpg)")
+
+# Seconds browsers may keep a thumbnail; its name changes with its contents
+AVATAR_CACHE_SECONDS = 365 * 24 * 60 * 60
+
+
+def flatten(image):
+    """Returns an upright RGB copy of the image, with transparent areas on white."""
+    image = ImageOps.exif_transpose(image)
+    if image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info):
+        image = image.convert("RGBA")
+        background = Image.new("RGB", image.size, "white")
+        background.paste(image, mask=image.getchannel("A"))
+        return background
+    return image.convert("RGB")
+
+
+def store(data, extension):
+    """Saves the data under a name derived from its hash, unless a file with that name exists."""
+    name = f"{AVATAR_DIR}{hashlib.sha256(data).hexdigest()[:16]}.{extension}"
+    if default_storage.exists(name):
+        return name
+    return default_storage.save(name, ContentFile(data))
+
+
+def make_thumbnails(picture):
+    """Writes the thumbnails of an image file and returns {size: {format: storage name}}.
+
+    Sizes are strings, as the result is stored in a JSONField.
+    """
+    with picture.open("rb") as f, Image.open(f) as original:
+        # Lets JPEG decoding skip straight to a reduced scale
+        original.draft("RGB", (max(AVATAR_SIZES) * 2, max(AVATAR_SIZES) * 2))
+        image = flatten(original)
+
+    thumbnails = {}
+    for size in AVATAR_SIZES:
+        thumbnail = ImageOps.fit(image, (size, size), Image.Resampling.LANCZOS)
+        for key, (pillow_format, options, extension, _) in AVATAR_FORMATS.items():
+            buffer = BytesIO()
+            thumbnail.save(buffer, pillow_format, **options)
+            thumbnails.setdefault(str(size), {})[key] = store(buffer.getvalue(), extension)
+    return thumbnails
+
+
+def avatar_url(name):
+    return reverse("avatar", args=[name.removeprefix(AVATAR_DIR)])
+
+
+def avatar_sources(thumbnails):
+    """Returns the srcset of each format plus a 1x JPEG "src" for a <picture>, or None if thumbnails are missing."""
+    if not all(str(size) in thumbnails for size in AVATAR_SIZES):
+        return None
+    sources = {
+        key: ", ".join(
+            f"{avatar_url(thumbnails[str(size)][key])} {size // AVATAR_SIZES[0]}x" for size in AVATAR_SIZES)
+        for key in AVATAR_FORMATS
+    }
+    sources["src"] = avatar_url(thumbnails[str(AVATAR_SIZES[0])]["jpeg"])
+    return sources
@@ -0,0 +1,260 @@
+"""Synthetic fleet data and timing helpers for the benchmark management commands."""
+
+import math
+import random
+import statistics
+import time
+import tracemalloc
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .exports import EXPORT_CHUNK_SIZE
+from .models import Asset, PurchaseDetails, FinancingDetails, LicensingDetails, ExportJob, ExpiryReminder
+from .rollups import deferred_rollups, rebuild_rollups
+from .search import index_assets
+from .tasks import REMINDER_CHUNK_SIZE, reminder_chunks, reminders_due, run_export_job, send_reminder_chunk
+
+# Seeded assets are recognised, and cleaned up, by this VIN prefix
+SEED_VIN_PREFIX = "BENCH-"
+
+# Username of the user the signed-in views are requested as
+SEED_USERNAME = "bench-user"
+
+VEHICLE_TYPES = [
+    # (vehicle_type, sub_category, makes)
+    ("Truck", "Truck Tractor", ["SCANIA", "VOLVO", "MERCEDES-BENZ", "MAN"]),
+    ("Trailer", "Standard Side Tipper Link", ["AFRIT", "TRAILMAX", "SA TRUCK BODIES"]),
+    ("Light Vehicle", "Double Cab", ["TOYOTA", "FORD", "ISUZU", "NISSAN"]),
+]
+FUNDERS = ["ABSA", "WESBANK", "STANDARD BANK", "NEDBANK", None]
+DEALERS = ["Truck World", "Atlas Trucks", "Scania Midrand", "Toyota Centurion"]
+
+
+def synthetic_rows(count, start=0, seed=0):
+    """Yields dicts of model field values shaped like parsed import_assets CSV rows."""
+    rng = random.Random(seed + start)
+    today = date.today()
+
+    for i in range(start, start + count):
+        vehicle_type, sub_category, makes = rng.choice(VEHICLE_TYPES)
+        year = rng.randint(2015, today.year)
+        cost_price = Decimal(rng.randint(250_000, 2_500_000))
+        funder = rng.choice(FUNDERS)
+
+        yield {
+            "asset": {
+                "year": year,
+                "make": rng.choice(makes),
+                "model": f"{sub_category.upper()} {rng.randint(1, 60)}",
+                "vehicle_type": vehicle_type,
+                "sub_category": sub_category,
+                "classification": "Financed Vehicles" if funder else "Owned Vehicles",
+                "status": "Active" if rng.random() < 0.8 else "Inactive",
+                "vin": f"{SEED_VIN_PREFIX}{i:09d}",
+            },
+            "purchase": {
+                "purchase_date": date(year, rng.randint(1, 12), rng.randint(1, 28)),
+                "dealership": rng.choice(DEALERS),
+                "invoice_no": f"INV{i:07d}",
+                "cost_price": cost_price,
+            },
+            "financing": {
+                "funding_institution": funder,
+                "loan_ref_number": str(rng.randint(1_000_000, 9_999_999)),
+                "loan_end_date": today + timedelta(days=rng.randint(-365, 5 * 365)),
+                "loan_terms": 60,
+                "installments": (cost_price / 60).quantize(Decimal("0.001")),
+            } if funder else None,
+            "licensing": {
+                "reg_no": f"BN{i:07d} GP",
+                "fleet_no": f"BEN {i % 1000:03d}",
+                "disc_fee": Decimal(rng.choice([450, 1850, 18500, 19500])),
+                "disc_expiry_date": today + timedelta(days=rng.randint(-60, 365)),
+            },
+        }
+
+
+def seed_fleet(count, batch_size=1000, seed=0):
+    """Bulk-creates and indexes ``count`` synthetic assets with related records, continuing after existing seeded rows."""
+    start = Asset.objects.filter(vin__startswith=SEED_VIN_PREFIX).count()
+    created = 0
+
+    while created < count:
+        size = min(batch_size, count - created)
+        rows = list(synthetic_rows(size, start + created, seed))
+        with transaction.atomic():
+            assets = Asset.objects.bulk_create([Asset(**row["asset"]) for row in rows])
+            if any(asset.pk is None for asset in assets):
+                # Backends that can't return ids from bulk inserts (MySQL)
+                ids = dict(Asset.objects.filter(vin__in=[a.vin for a in assets]).values_list("vin", "id"))
+                for asset in assets:
+                    asset.pk = ids[asset.vin]
+
+            PurchaseDetails.objects.bulk_create(
+                [PurchaseDetails(asset=asset, **row["purchase"]) for asset, row in zip(assets, rows)])
+            FinancingDetails.objects.bulk_create(
+                [FinancingDetails(asset=asset, **row["financing"])
+                 for asset, row in zip(assets, rows) if row["financing"]])
+            LicensingDetails.objects.bulk_create(
+                [LicensingDetails(asset=asset, **row["licensing"]) for asset, row in zip(assets, rows)])
+            # bulk_create skips the save signals that keep the search index current
+            index_assets(asset.pk for asset in assets)
+        created += size
+
+    rebuild_rollups()
+    return created
+
+
+def remove_seeded_fleet():
+    """Deletes every seeded asset and, by cascade, its related records."""
+    with deferred_rollups():
+        return Asset.objects.filter(vin__startswith=SEED_VIN_PREFIX).delete()
+
+
+def time_call(func, repeat=20):
+    """Runs ``func`` ``repeat`` times and returns the (median, max) wall time in milliseconds."""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings), max(timings)
+
+
+def export_query_budget(asset_count):
+    # One joined asset query plus financing and licensing per chunk, and the final empty chunk
+    return 1 + 3 * math.ceil(asset_count / EXPORT_CHUNK_SIZE)
+
+
+def export_job_query_budget(asset_count):
+    # The job's insert, load, Running and Done updates and delete, the row count, and a
+    # progress update per chunk on top of the export's own queries
+    return 6 + export_query_budget(asset_count) + math.ceil(asset_count / EXPORT_CHUNK_SIZE)
+
+
+def reminder_query_budget(due_count):
+    # Clearing the seeded ledger (BEGIN, DELETE, COMMIT on SQLite) and listing the due ids,
+    # then per chunk its licences and one ledger insert. A chunk's digests are assumed to go
+    # out in one send, which holds while a chunk's licences span fewer than 25 digests.
+    return 4 + 4 * math.ceil(due_count / REMINDER_CHUNK_SIZE)
+
+
+def run_export_benchmark():
+    """Creates, runs and deletes one CSV export job of the active assets."""
+    job = ExportJob.objects.create(
+        columns="vin,make,model,cost_price,funding_institution,reg_no", export_format="csv")
+    run_export_job(job.pk)
+    job.file.delete(save=False)
+    job.delete()
+
+
+def clear_seeded_reminders():
+    ExpiryReminder.objects.filter(licence__asset__vin__startswith=SEED_VIN_PREFIX).delete()
+
+
+def run_reminder_benchmark():
+    """Runs every chunk of licences due a reminder, the work the qcluster workers share."""
+    clear_seeded_reminders()
+    for first_id, last_id in reminder_chunks(reminders_due(date.today()), REMINDER_CHUNK_SIZE):
+        send_reminder_chunk(first_id, last_id)
+
+
+# (name, URL name, URL argument, GET parameters, query budget with a cold cache).
+# The URL argument names the id the URL takes, if any: "asset" or "export_job".
+# A callable budget is given the number of assets.
+VIEW_BENCHMARKS = [
+    ("home", "home", None, {}, 1),
+    ("asset_list", "asset_list", None, {}, 2),
+    ("truck_list", "truck_list", None, {}, 2),
+    ("trailer_list", "trailer_list", None, {}, 2),
+    ("light_list", "light_list", None, {}, 2),
+    ("inactive_list", "inactive_list", None, {}, 2),
+    ("finance_summary", "finance_summary", None, {}, 1),
+    ("licensing", "licensing", None, {}, 3),
+    ("asset_detail", "asset-detail", "asset", {}, 4),
+    ("asset_detail_json", "asset-detail", "asset", {"format": "json"}, 4),
+    ("edit_asset", "edit_asset", "asset", {}, 3),
+    ("search", "search", None, {"q": "scania"}, 3),
+    ("autocomplete", "autocomplete", None, {"q": "BN00"}, 2),
+    ("export_csv", "export_assets", None,
+     {"vehicle_type": "all", "columns": "vin,make,model,cost_price,funding_institution,reg_no"},
+     export_query_budget),
+    ("api_assets", "api_assets", None,
+     {"fields": "vin,make,model,cost_price,funding_institution,reg_no", "limit": 500}, 3),
+    ("login", "login", None, {}, 0),
+    ("register", "register", None, {}, 0),
+]
+
+# Views that need a signed-in user, requested as SEED_USERNAME. Their budgets include the
+# session and user lookups, and the export job views are given one of that user's jobs.
+SIGNED_IN_VIEW_BENCHMARKS = [
+    ("edit_profile", "edit_profile", None, {}, 2),
+    ("add_asset", "add_asset", None, {}, 2),
+    ("export_job", "export_job", "export_job", {}, 3),
+    ("export_job_status", "export_job_status", "export_job", {}, 3),
+]
+
+
+def benchmark_requests(url_args, asset_count, views=VIEW_BENCHMARKS):
+    """Yields (name, url, GET parameters, query budget) for each of ``views``.
+
+    ``url_args`` maps the URL argument names of the entries to ids. Some views
+    are left out of the benchmarks:
+
+    - create_export_job and api_assets_bulk are POSTs that queue a task or write
+      assets on every request. The job create_export_job queues is budgeted by
+      export_job_query_budget, and a bulk edit is one batch of at most
+      MAX_BULK_ITEMS assets whatever the fleet size.
+    - export_job_download needs a finished job's file. It runs the same three
+      queries as export_job and then streams the file.
+    - avatar_file reads a thumbnail from storage and runs no queries.
+    - logout only ends the session.
+    """
+    for name, url_name, url_arg, params, budget in views:
+        url = reverse(url_name, args=[url_args[url_arg]] if url_arg else [])
+        yield name, url, params, budget(asset_count) if callable(budget) else budget
+
+
+def fetch(client, url, params):
+    """GETs a URL and reads the whole body, so streamed responses run to completion."""
+    response = client.get(url, params)
+    if response.streaming:
+        for _ in response.streaming_content:
+            pass
+    else:
+        response.content
+    return response
+
+
+def count_queries(func):
+    """Runs ``func`` once with empty caches; returns its result and the number of queries it ran."""
+    cache.clear()
+    with CaptureQueriesContext(connection) as queries:
+        result = func()
+    return result, len(queries)
+
+
+def peak_memory(func):
+    """Runs ``func`` once and returns the peak Python memory it allocated, in KiB."""
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1] / 1024
+    finally:
+        tracemalloc.stop()
+
+
+def percentiles(func, repeat=20):
+    """Runs ``func`` ``repeat`` times and returns the (p50, p95) wall time in milliseconds."""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return statistics.median(timings), timings[min(len(timings) - 1, math.ceil(len(timings) * 0.95) - 1)]
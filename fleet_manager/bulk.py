@@ -0,0 +1,166 @@
+"""Batch edits of asset fields, e.g. marking a depot's assets inactive.
+
+The batch runs in one transaction: its assets are locked and all items are
+validated before anything is written. Changes are then applied with
+QuerySet.update() (when every item makes the same change) or bulk_update().
+Neither sends model signals, so the search index, fleet rollups, summary caches
+and page versions are updated here instead.
+"""
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils.timezone import now
+
+from . import rollups
+from .models import Asset
+from .page_cache import bump_data_versions
+from .search import index_assets
+from .summaries import invalidate_summaries
+
+# Fields a batch may change; like edit_asset_view, the VIN is not editable
+BULK_EDITABLE_FIELDS = ("year", "make", "model", "vehicle_type", "sub_category", "classification", "status")
+
+# Largest batch accepted in one request
+MAX_BULK_ITEMS = 1000
+
+# Largest value of Asset's BigAutoField primary key
+MAX_ASSET_ID = 2 ** 63 - 1
+
+
+class BulkEditError(Exception):
+    """Raised with the per-item results when a batch is rejected; nothing has been written."""
+
+    def __init__(self, results):
+        super().__init__("The batch has invalid items")
+        self.results = results
+
+
+def clean_changes(item):
+    """Returns (changes, errors) for an item's field updates, converted to the fields' Python types."""
+    changes, errors = {}, {}
+    for name, value in item.items():
+        if name in ("id", "vin"):
+            continue
+        if name not in BULK_EDITABLE_FIELDS:
+            errors[name] = "Not an editable field."
+            continue
+        try:
+            changes[name] = Asset._meta.get_field(name).clean(value, None)
+        except ValidationError as e:
+            errors[name] = " ".join(e.messages)
+    if not changes and not errors:
+        errors["__all__"] = "No fields to update."
+    return changes, errors
+
+
+def reference_error(item):
+    """Returns why an item doesn't name its asset by exactly one integer id or string VIN, or None if it does."""
+    if ("id" in item) == ("vin" in item):
+        return "Give either an id or a vin."
+    if "id" in item:
+        asset_id = item["id"]
+        # bool is an int subclass, but true isn't an id
+        if not isinstance(asset_id, int) or isinstance(asset_id, bool) or not 0 < asset_id <= MAX_ASSET_ID:
+            return "The id must be a positive integer."
+    elif not isinstance(item["vin"], str):
+        return "The vin must be a string."
+    return None
+
+
+def find_assets(items):
+    """Loads and locks every asset the valid items refer to, by id or VIN, in one query."""
+    items = [item for item in items if reference_error(item) is None]
+    ids = [item["id"] for item in items if "id" in item]
+    vins = [item["vin"] for item in items if "vin" in item]
+    assets = (
+        Asset.objects.select_for_update()
+        .filter(Q(id__in=ids) | Q(vin__in=vins))
+        .only("id", "vin", "version", *BULK_EDITABLE_FIELDS)
+    )
+    by_id = {asset.id: asset for asset in assets}
+    by_vin = {asset.vin: asset for asset in by_id.values()}
+    return by_id, by_vin
+
+
+@transaction.atomic
+def bulk_edit_assets(items):
+    """Applies a batch of {"id" or "vin": ..., field: value, ...} items and returns one result per item.
+
+    Each result has the item's index, the asset id and VIN when found, and a
+    status: "updated", "unchanged", or with ``errors`` "invalid" or
+    "not_found". Raises BulkEditError without writing anything if any item
+    fails; its valid items then have the status "not_applied".
+    """
+    if len(items) > MAX_BULK_ITEMS:
+        raise BulkEditError([{"index": None, "status": "invalid",
+                              "errors": {"__all__": f"At most {MAX_BULK_ITEMS} items per batch."}}])
+
+    items = [item if isinstance(item, dict) else {} for item in items]
+    by_id, by_vin = find_assets(items)
+    results, changed, seen = [], {}, set()
+
+    for index, item in enumerate(items):
+        result = {"index": index, "status": "invalid"}
+        results.append(result)
+        error = reference_error(item)
+        if error is not None:
+            result["errors"] = {"__all__": error}
+            continue
+
+        asset = by_id.get(item["id"]) if "id" in item else by_vin.get(item["vin"])
+        changes, errors = clean_changes(item)
+        if asset is None:
+            result.update(status="not_found", errors={"__all__": "No such asset."})
+            continue
+        result.update(id=asset.id, vin=asset.vin)
+        if asset.id in seen:
+            errors["__all__"] = "The asset appears more than once in the batch."
+        seen.add(asset.id)
+        if errors:
+            result["errors"] = errors
+            continue
+
+        changes = {name: value for name, value in changes.items() if getattr(asset, name) != value}
+        result["status"] = "updated" if changes else "unchanged"
+        if changes:
+            changed[asset.id] = (asset, changes)
+
+    if any("errors" in result for result in results):
+        for result in results:
+            if "errors" not in result:
+                result["status"] = "not_applied"
+        raise BulkEditError(results)
+    if changed:
+        apply_changes(changed)
+    return results
+
+
+def apply_changes(changed):
+    """Writes {asset id: (asset, changes)} and brings the derived data up to date, inside bulk_edit_assets()'s transaction."""
+    change_sets = {tuple(sorted(changes.items())) for _, changes in changed.values()}
+    moves = {}
+    for asset, changes in changed.values():
+        before = (asset.vehicle_type, asset.status)
+        for name, value in changes.items():
+            setattr(asset, name, value)
+        if (asset.vehicle_type, asset.status) != before:
+            moves[asset.id] = (before, (asset.vehicle_type, asset.status))
+
+    if len(change_sets) == 1:
+        # The common case, e.g. every item sets status=Inactive: one UPDATE ... WHERE id IN (...)
+        Asset.objects.filter(id__in=list(changed)).update(
+            **dict(change_sets.pop()), version=F("version") + 1, updated_at=now())
+    else:
+        fields = sorted({name for _, changes in changed.values() for name in changes})
+        assets = [asset for asset, _ in changed.values()]
+        for asset in assets:
+            asset.version += 1
+            asset.updated_at = now()
+        Asset.objects.bulk_update(assets, fields + ["version", "updated_at"], batch_size=500)
+
+    if moves:
+        rollups.assets_moved(moves)
+    index_assets(list(changed))
+    # After commit, so no request caches the summaries or pages from uncommitted rows
+    transaction.on_commit(lambda: (invalidate_summaries("Asset"), bump_data_versions("Asset")))
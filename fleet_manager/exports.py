@@ -0,0 +1,342 @@
+"""Asset exports: one denormalised row per asset, streamed as CSV, XLSX or Parquet."""
+
+import csv
+import zipfile
+from decimal import Decimal
+from xml.sax.saxutils import escape
+
+from asgiref.sync import sync_to_async
+from django.db import models
+
+from .models import Asset, PurchaseDetails, FinancingDetails, LicensingDetails
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # Parquet exports are optional
+    pyarrow = None
+
+
+# Number of assets fetched from the database, and written to the client, at a time
+EXPORT_CHUNK_SIZE = 2000
+
+# Seconds a background export task may run; Q_CLUSTER's retry must be larger
+EXPORT_JOB_TIMEOUT = 600
+
+# Days an export job and its file are kept before purge_export_jobs deletes them
+EXPORT_JOB_RETENTION_DAYS = 7
+
+# vehicle_type query parameter -> (queryset filter, file name without extension)
+ASSET_FILTERS = {
+    "all": ({"status": "Active"}, "all_assets"),
+    "truck": ({"vehicle_type": "Truck", "status": "Active"}, "trucks"),
+    "trailer": ({"vehicle_type": "Trailer", "status": "Active"}, "trailers"),
+    "light": ({"vehicle_type": "Light Vehicle", "status": "Active"}, "light_vehicles"),
+    "inactive": ({"status": "Inactive"}, "inactive_assets"),
+}
+
+# Column key -> (header label, model, field name)
+EXPORT_COLUMNS = {
+    "id": ("ID", Asset, "id"),
+    "make": ("Make", Asset, "make"),
+    "model": ("Model", Asset, "model"),
+    "year": ("Year", Asset, "year"),
+    "vehicle_type": ("Type", Asset, "vehicle_type"),
+    "status": ("Status", Asset, "status"),
+    "sub_category": ("Sub Category", Asset, "sub_category"),
+    "classification": ("Classification", Asset, "classification"),
+    "vin": ("VIN", Asset, "vin"),
+    "purchase_date": ("Purchase Date", PurchaseDetails, "purchase_date"),
+    "dealership": ("Dealership", PurchaseDetails, "dealership"),
+    "invoice_no": ("Invoice No", PurchaseDetails, "invoice_no"),
+    "cost_price": ("Cost Price", PurchaseDetails, "cost_price"),
+    "funding_institution": ("Funding Institution", FinancingDetails, "funding_institution"),
+    "loan_ref_number": ("Loan Ref Number", FinancingDetails, "loan_ref_number"),
+    "loan_end_date": ("Loan End Date", FinancingDetails, "loan_end_date"),
+    "loan_terms": ("Loan Terms", FinancingDetails, "loan_terms"),
+    "installments": ("Installments", FinancingDetails, "installments"),
+    "reg_no": ("Reg No", LicensingDetails, "reg_no"),
+    "fleet_no": ("Fleet No", LicensingDetails, "fleet_no"),
+    "disc_fee": ("Disc Fee", LicensingDetails, "disc_fee"),
+    "disc_expiry_date": ("Disc Expiry Date", LicensingDetails, "disc_expiry_date"),
+}
+
+# The columns of the original asset list export
+DEFAULT_COLUMNS = ["make", "model", "year", "vehicle_type", "status"]
+
+
+def assets_for_export(vehicle_type):
+    """Returns the assets and file name for a vehicle_type query parameter, defaulting to all active assets."""
+    filters, filename = ASSET_FILTERS.get(vehicle_type, ASSET_FILTERS["all"])
+    return Asset.objects.filter(**filters), filename
+
+
+def parse_columns(value):
+    """Splits a comma-separated column list, raising ValueError on unknown columns."""
+    if not value:
+        return list(DEFAULT_COLUMNS)
+    columns = [column.strip() for column in value.split(",") if column.strip()]
+    unknown = [column for column in columns if column not in EXPORT_COLUMNS]
+    if unknown or not columns:
+        raise ValueError(f"Unknown export columns: {', '.join(unknown) or value}")
+    return columns
+
+
+def export_plan(columns):
+    """Returns the asset and purchase lookups of the columns, and {model: fields} for financing and licensing."""
+    lookups = []
+    related_fields = {FinancingDetails: [], LicensingDetails: []}
+    for column in columns:
+        _, model, field_name = EXPORT_COLUMNS[column]
+        if model is Asset:
+            lookups.append(field_name)
+        elif model is PurchaseDetails:
+            lookups.append(f"purchasedetails__{field_name}")
+        elif field_name not in related_fields[model]:
+            related_fields[model].append(field_name)
+    return lookups, {model: fields for model, fields in related_fields.items() if fields}
+
+
+def chunk_query(assets, lookups, last_id, chunk_size):
+    return assets.filter(id__gt=last_id).order_by("id").values_list("id", *lookups)[:chunk_size]
+
+
+def related_query(model, fields, chunk):
+    # Ordered by descending id so the first record per asset is kept
+    return (
+        model.objects.filter(asset_id__in=[row[0] for row in chunk])
+        .order_by("-id")
+        .values_list("asset_id", *fields)
+    )
+
+
+def chunk_rows(chunk, columns, related_values):
+    """Merges a chunk's asset rows with their {model: {asset id: {field: value}}} related values."""
+    rows = []
+    for row in chunk:
+        asset_values = iter(row[1:])
+        values = []
+        for column in columns:
+            _, model, field_name = EXPORT_COLUMNS[column]
+            if model is Asset or model is PurchaseDetails:
+                values.append(next(asset_values))
+            else:
+                values.append(related_values[model].get(row[0], {}).get(field_name))
+        rows.append(tuple(values))
+    return rows
+
+
+def export_chunks(assets, columns, chunk_size=EXPORT_CHUNK_SIZE, after_id=0):
+    """Yields lists of row tuples, one row per asset, ``chunk_size`` assets at a time.
+
+    Asset and purchase columns come from one joined query per chunk, walking the
+    assets by id from ``after_id``; financing and licensing columns add one query
+    per chunk each. Assets with several financing or licensing records export the
+    first one.
+    """
+    lookups, related_fields = export_plan(columns)
+    last_id = after_id
+    while True:
+        chunk = list(chunk_query(assets, lookups, last_id, chunk_size))
+        if not chunk:
+            return
+        last_id = chunk[-1][0]
+
+        related_values = {}
+        for model, fields in related_fields.items():
+            related_values[model] = {
+                record[0]: dict(zip(fields, record[1:])) for record in related_query(model, fields, chunk)
+            }
+        yield chunk_rows(chunk, columns, related_values)
+
+
+async def aexport_chunks(assets, columns, chunk_size=EXPORT_CHUNK_SIZE):
+    """Async export_chunks(), running the same queries with the async ORM."""
+    lookups, related_fields = export_plan(columns)
+    last_id = 0
+    while True:
+        chunk = [row async for row in chunk_query(assets, lookups, last_id, chunk_size)]
+        if not chunk:
+            return
+        last_id = chunk[-1][0]
+
+        related_values = {}
+        for model, fields in related_fields.items():
+            related_values[model] = {
+                record[0]: dict(zip(fields, record[1:])) async for record in related_query(model, fields, chunk)
+            }
+        yield chunk_rows(chunk, columns, related_values)
+
+
+async def aiterate(iterator):
+    """Yields the items of a sync iterator, advancing it in Django's sync thread so the event loop isn't blocked."""
+    iterator = iter(iterator)
+    done = object()
+    while (item := await sync_to_async(next)(iterator, done)) is not done:
+        yield item
+
+
+class StreamBuffer:
+    """Write-only file object whose contents are drained after every chunk.
+
+    It has tell() but no seek(), so zipfile and pyarrow write sequentially.
+    """
+
+    def __init__(self):
+        self.parts = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b"".join(self.parts)
+        self.parts = []
+        return data
+
+
+class Echo:
+    """File-like object whose write() returns the value, so csv.writer rows can be streamed."""
+
+    def write(self, value):
+        return value
+
+
+def write_csv(columns, chunks):
+    writer = csv.writer(Echo())
+    yield writer.writerow([EXPORT_COLUMNS[column][0] for column in columns])
+    for rows in chunks:
+        yield "".join(writer.writerow(row) for row in rows)
+
+
+async def awrite_csv(columns, chunks):
+    """write_csv() for the async chunks of aexport_chunks()."""
+    writer = csv.writer(Echo())
+    yield writer.writerow([EXPORT_COLUMNS[column][0] for column in columns])
+    async for rows in chunks:
+        yield "".join(writer.writerow(row) for row in rows)
+
+
+XLSX_PARTS = {
+    "[Content_Types].xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    "_rels/.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    "xl/workbook.xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Assets" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    ),
+    "xl/_rels/workbook.xml.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'
+    ),
+}
+
+
+def xlsx_cell(value):
+    if value is None:
+        return "<c/>"
+    if isinstance(value, (int, float, Decimal)) and not isinstance(value, bool):
+        return f"<c><v>{value}</v></c>"
+    return f'<c t="inlineStr"><is><t>{escape(str(value))}</t></is></c>'
+
+
+def xlsx_row(values):
+    return "<row>" + "".join(xlsx_cell(value) for value in values) + "</row>"
+
+
+def write_xlsx(columns, chunks):
+    """Writes a single-sheet workbook with inline strings, streaming the worksheet XML."""
+    buffer = StreamBuffer()
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, content in XLSX_PARTS.items():
+            archive.writestr(name, content)
+        yield buffer.drain()
+
+        with archive.open("xl/worksheets/sheet1.xml", "w", force_zip64=True) as sheet:
+            sheet.write(
+                b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                b'<sheetData>'
+            )
+            sheet.write(xlsx_row(EXPORT_COLUMNS[column][0] for column in columns).encode())
+            for rows in chunks:
+                sheet.write("".join(xlsx_row(row) for row in rows).encode())
+                yield buffer.drain()
+            sheet.write(b"</sheetData></worksheet>")
+    yield buffer.drain()
+
+
+def arrow_type(field):
+    if isinstance(field, models.DecimalField):
+        return pyarrow.decimal128(field.max_digits, field.decimal_places)
+    if isinstance(field, models.DateField):
+        return pyarrow.date32()
+    if isinstance(field, models.IntegerField):
+        return pyarrow.int64()
+    return pyarrow.string()
+
+
+def write_parquet(columns, chunks):
+    """Writes one Parquet row group per chunk of assets."""
+    fields = []
+    for column in columns:
+        _, model, field_name = EXPORT_COLUMNS[column]
+        fields.append((column, arrow_type(model._meta.get_field(field_name))))
+    schema = pyarrow.schema(fields)
+
+    buffer = StreamBuffer()
+    with pyarrow.parquet.ParquetWriter(buffer, schema, compression="snappy") as writer:
+        for rows in chunks:
+            writer.write_table(pyarrow.Table.from_pylist(
+                [dict(zip(columns, row)) for row in rows], schema=schema))
+            yield buffer.drain()
+    yield buffer.drain()
+
+
+# Export format -> (writer, content type, file extension)
+EXPORT_FORMATS = {
+    "csv": (write_csv, "text/csv", "csv"),
+    "xlsx": (write_xlsx, "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", "xlsx"),
+    "parquet": (write_parquet, "application/vnd.apache.parquet", "parquet"),
+}
+
+# Export format -> writer taking aexport_chunks(). XLSX and Parquet compression
+# is CPU-bound, so the async view runs those writers through aiterate() instead.
+ASYNC_EXPORT_WRITERS = {
+    "csv": awrite_csv,
+}
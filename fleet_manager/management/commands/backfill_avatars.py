@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand
+from django_q.tasks import async_task
+from PIL import Image
+
+from fleet_manager.models import DEFAULT_PROFILE_PICTURE, User
+from fleet_manager.tasks import make_avatar_thumbnails
+
+
+class Command(BaseCommand):
+    help = 'Make the avatar thumbnails of users who uploaded a profile picture before thumbnails existed'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Remake the thumbnails of every user with an uploaded picture, not just those without.',
+        )
+        parser.add_argument(
+            '--queue',
+            action='store_true',
+            help='Queue one django_q task per user instead of resizing here.',
+        )
+
+    def handle(self, *args, **kwargs):
+        users = (
+            User.objects.exclude(profile_picture__isnull=True)
+            .exclude(profile_picture__in=["", DEFAULT_PROFILE_PICTURE])
+            .only('id', 'username', 'avatar_thumbnails')
+            .order_by('id')
+        )
+        done = failed = 0
+
+        for user in users.iterator():
+            if user.avatar_thumbnails and not kwargs['all']:
+                continue
+            if kwargs['queue']:
+                async_task("fleet_manager.tasks.make_avatar_thumbnails", user.pk)
+                done += 1
+                continue
+            try:
+                make_avatar_thumbnails(user.pk)
+            except (OSError, Image.DecompressionBombError) as e:
+                # A missing or unreadable picture; the original keeps being shown
+                failed += 1
+                self.stderr.write(f"{user.username}: {e}")
+                continue
+            done += 1
+
+        action = "Queued thumbnails for" if kwargs['queue'] else "Made thumbnails for"
+        self.stdout.write(self.style.SUCCESS(f"{action} {done} users ({failed} failed)."))
@@ -0,0 +1,116 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from fleet_manager.benchmark import remove_seeded_fleet, seed_fleet, time_call
+from fleet_manager.models import Asset, LicensingDetails
+from fleet_manager.tasks import reminders_due
+
+# (model, index name) of the indexes measured by this command
+BENCHMARKED_INDEXES = [
+    (Asset, "asset_status_type_id_idx"),
+    (Asset, "asset_status_id_idx"),
+    (LicensingDetails, "licence_expiry_idx"),
+]
+
+
+def hot_queries():
+    """Returns (label, queryset) pairs for the access paths the indexes serve."""
+    return [
+        ("asset_list page", Asset.objects.filter(status="Active").order_by("id")[:10]),
+        ("truck_list page", Asset.objects.filter(vehicle_type="Truck", status="Active").order_by("id")[:10]),
+        ("truck_list count", Asset.objects.filter(vehicle_type="Truck", status="Active").values("id")),
+        ("inactive_list page", Asset.objects.filter(status="Inactive").order_by("id")[:10]),
+        ("licensing page", LicensingDetails.objects.order_by("disc_expiry_date")[:5]),
+        ("expiry reminder scan", reminders_due(date.today())),
+    ]
+
+
+class Command(BaseCommand):
+    help = ('Seed a synthetic fleet in a throwaway test database and report query plans and latencies '
+            'for the list, licensing and reminder queries with and without their indexes')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--assets',
+            type=int,
+            default=10000,
+            help='Number of synthetic assets to seed before measuring (default: 10000).',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=20,
+            help='Times each query is run; the median and max are reported (default: 20).',
+        )
+        parser.add_argument(
+            '--i-know-this-is-not-production',
+            action='store_true',
+            dest='use_configured_database',
+            help='Seed and drop indexes in the configured database instead of a throwaway test database.',
+        )
+        parser.add_argument(
+            '--keep',
+            action='store_true',
+            help='Keep the seeded assets in the configured database instead of deleting them afterwards.',
+        )
+
+    def measure(self, label, repeat):
+        self.stdout.write(self.style.MIGRATE_HEADING(label))
+        results = {}
+        for name, queryset in hot_queries():
+            plan = queryset.explain()
+            # count() for the paginator query, full fetch for the rest
+            run = queryset.count if name.endswith("count") else (lambda qs=queryset: list(qs.all()))
+            median, worst = time_call(run, repeat)
+            results[name] = median
+            self.stdout.write(f"  {name}: median {median:.2f} ms, max {worst:.2f} ms")
+            for line in plan.splitlines():
+                self.stdout.write(f"      {line}")
+        return results
+
+    def set_indexes(self, enabled):
+        with connection.schema_editor() as schema_editor:
+            for model, name in BENCHMARKED_INDEXES:
+                index = next(index for index in model._meta.indexes if index.name == name)
+                if enabled:
+                    schema_editor.add_index(model, index)
+                else:
+                    schema_editor.remove_index(model, index)
+
+    def benchmark(self, assets, repeat, keep):
+        self.stdout.write(f"Seeding {assets} synthetic assets...")
+        seed_fleet(assets)
+
+        try:
+            self.set_indexes(False)
+            try:
+                before = self.measure("Without indexes", repeat)
+            finally:
+                self.set_indexes(True)
+            after = self.measure("With indexes", repeat)
+        finally:
+            if not keep:
+                remove_seeded_fleet()
+        return before, after
+
+    def handle(self, *args, **kwargs):
+        if kwargs['use_configured_database']:
+            before, after = self.benchmark(kwargs['assets'], kwargs['repeat'], kwargs['keep'])
+        else:
+            if kwargs['keep']:
+                raise CommandError('--keep only applies with --i-know-this-is-not-production.')
+            # The seeded rows and dropped indexes never touch the configured database
+            database_name = connection.settings_dict['NAME']
+            connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+            try:
+                # Nothing to clean up, the test database is dropped with its rows
+                before, after = self.benchmark(kwargs['assets'], kwargs['repeat'], keep=True)
+            finally:
+                connection.creation.destroy_test_db(database_name, verbosity=0)
+
+        self.stdout.write(self.style.MIGRATE_HEADING("Summary (median ms)"))
+        for name, median in after.items():
+            speedup = before[name] / median if median else 0
+            self.stdout.write(f"  {name}: {before[name]:.2f} -> {median:.2f} ({speedup:.1f}x)")
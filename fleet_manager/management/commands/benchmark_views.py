@@ -0,0 +1,102 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from fleet_manager.benchmark import (
+    SEED_USERNAME, SEED_VIN_PREFIX, SIGNED_IN_VIEW_BENCHMARKS, benchmark_requests, clear_seeded_reminders,
+    count_queries, export_job_query_budget, fetch, peak_memory, percentiles, reminder_query_budget,
+    remove_seeded_fleet, run_export_benchmark, run_reminder_benchmark, seed_fleet,
+)
+from fleet_manager.models import Asset, ExportJob, User
+from fleet_manager.tasks import reminders_due
+
+
+class Command(BaseCommand):
+    help = ('Seed synthetic fleets of increasing size and report p50/p95 latency, queries per request '
+            'and peak memory for every fleet_manager view, the background export and the reminder task')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--assets',
+            type=int,
+            nargs='+',
+            default=[1000, 10000],
+            help='Fleet sizes to measure, smallest first (default: 1000 10000).',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=20,
+            help='Times each view is requested for the latency percentiles (default: 20).',
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='Random seed of the synthetic fleet (default: 0).',
+        )
+        parser.add_argument(
+            '--keep',
+            action='store_true',
+            help='Keep the seeded assets instead of deleting them afterwards.',
+        )
+
+    def report(self, name, func, repeat, budget=None):
+        _, queries = count_queries(func)
+        memory = peak_memory(func)
+        p50, p95 = percentiles(func, repeat)
+        over = budget is not None and queries > budget
+        line = (f"  {name:<20} p50 {p50:8.2f} ms  p95 {p95:8.2f} ms  "
+                f"{queries:3d} queries{f' (budget {budget})' if budget is not None else ''}  "
+                f"peak {memory:9.0f} KiB")
+        self.stdout.write(self.style.ERROR(line + "  OVER BUDGET") if over else line)
+        return not over
+
+    def measure(self, asset_count, repeat, user):
+        self.stdout.write(self.style.MIGRATE_HEADING(f"{asset_count} assets"))
+        client, signed_in = Client(), Client()
+        signed_in.force_login(user)
+        sample = Asset.objects.filter(vin__startswith=SEED_VIN_PREFIX).order_by("id").first()
+        job = ExportJob.objects.create(columns="vin,make", created_by=user)
+        url_args = {"asset": sample.pk, "export_job": job.pk}
+        # Budgets that scale with the fleet count every asset, not just the seeded ones
+        total = Asset.objects.count()
+
+        within_budget = True
+        for name, url, params, budget in benchmark_requests(url_args, total):
+            within_budget &= self.report(name, lambda: fetch(client, url, params), repeat, budget)
+        for name, url, params, budget in benchmark_requests(url_args, total, SIGNED_IN_VIEW_BENCHMARKS):
+            within_budget &= self.report(name, lambda: fetch(signed_in, url, params), repeat, budget)
+        signed_in.logout()
+        job.delete()
+
+        within_budget &= self.report(
+            "export job", run_export_benchmark, max(1, repeat // 10), export_job_query_budget(total))
+        clear_seeded_reminders()
+        due = reminders_due(date.today()).count()
+        within_budget &= self.report("reminder task", run_reminder_benchmark, 1, reminder_query_budget(due))
+        return within_budget
+
+    def handle(self, *args, **kwargs):
+        sizes = sorted(kwargs['assets'])
+        # Test client host, locmem email backend for the reminder task
+        setup_test_environment()
+        user, _ = User.objects.get_or_create(username=SEED_USERNAME)
+        within_budget = True
+        try:
+            for size in sizes:
+                seeded = Asset.objects.filter(vin__startswith=SEED_VIN_PREFIX).count()
+                if seeded < size:
+                    self.stdout.write(f"Seeding {size - seeded} synthetic assets...")
+                    seed_fleet(size - seeded, seed=kwargs['seed'])
+                within_budget &= self.measure(size, kwargs['repeat'], user)
+        finally:
+            teardown_test_environment()
+            user.delete()
+            if not kwargs['keep']:
+                remove_seeded_fleet()
+
+        if not within_budget:
+            raise CommandError("Some views or tasks ran more queries than their budget.")
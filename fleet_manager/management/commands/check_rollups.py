@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from fleet_manager.rollups import rebuild_rollups, rollup_differences
+
+
+class Command(BaseCommand):
+    help = 'Compare the fleet summary rollup tables with live aggregates of the source tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--repair',
+            action='store_true',
+            help='Rebuild the rollups when they disagree with the live aggregates.',
+        )
+
+    def handle(self, *args, **kwargs):
+        differences = rollup_differences()
+        if not differences:
+            self.stdout.write(self.style.SUCCESS("Rollups match the live aggregates."))
+            return
+
+        for name, key, stored, live in differences:
+            self.stdout.write(f"{name} {key}: stored (count, amount) {stored}, live {live}")
+
+        if kwargs['repair']:
+            rebuild_rollups()
+            self.stdout.write(self.style.SUCCESS(f"Rebuilt rollups after {len(differences)} differences."))
+            return
+        raise CommandError(f"{len(differences)} rollup groups differ from the live aggregates.")
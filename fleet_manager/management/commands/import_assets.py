@@ -1,14 +1,138 @@
 import csv
+import io
 import os
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
-from django.core.management.base import BaseCommand
+from itertools import islice
+
+import django
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, IntegrityError, connection, connections, transaction
+from django.db.models import Q
 from fleet_manager.models import Asset, PurchaseDetails, FinancingDetails, LicensingDetails
+from fleet_manager.search import index_assets
+from fleet_manager.rollups import rebuild_rollups
 from django.core.exceptions import ValidationError
+from django.utils.timezone import now
+
+
+DEFAULT_CSV_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), 'initial_fleet.csv')
+
+# How many times a chunk is retried after losing a VIN race to another worker
+CONFLICT_RETRIES = 3
+
+
+class QueryCounter:
+    """Execute wrapper that counts the SQL statements sent to the database."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def chunked(iterable, size):
+    """Yields lists of at most ``size`` items from ``iterable``."""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def shard_csv(path, workers):
+    """Splits a CSV file into line-aligned byte ranges, one per worker.
+
+    Returns the header's field names and a list of (start, end) offsets.
+    """
+    with open(path, 'rb') as f:
+        header = f.readline()
+        fieldnames = next(csv.reader([header.decode('utf-8-sig')]))
+        data_start = f.tell()
+        size = os.fstat(f.fileno()).st_size
+
+        boundaries = [data_start]
+        for i in range(1, workers):
+            f.seek(max(data_start + (size - data_start) * i // workers - 1, data_start))
+            f.readline()  # Move to the start of the next full line
+            if boundaries[-1] < f.tell() < size:
+                boundaries.append(f.tell())
+        boundaries.append(size)
+
+    return fieldnames, list(zip(boundaries, boundaries[1:]))
+
+
+def read_lines(f, end):
+    """Yields decoded lines from the binary file ``f`` until offset ``end``."""
+    while f.tell() < end:
+        line = f.readline()
+        if not line:
+            return
+        yield line.decode('utf-8')
+
+
+def init_worker():
+    if not apps.ready:
+        django.setup()
+
+
+def import_shard(path, start, end, fieldnames, batch_size, upsert):
+    """Imports the CSV lines between byte offsets ``start`` and ``end``.
+
+    Runs in a worker process on its own database connection and returns the
+    row totals and the number of queries issued.
+    """
+    command = Command()
+    counter = QueryCounter()
+    try:
+        with open(path, 'rb') as f, connection.execute_wrapper(counter):
+            f.seek(start)
+            reader = csv.DictReader(read_lines(f, end), fieldnames=fieldnames)
+            totals = command.import_rows(reader, batch_size, upsert)
+    finally:
+        connection.close()
+    return totals, counter.count
 
 
 class Command(BaseCommand):
     help = 'Import assets from a CSV file'
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--path',
+            default=DEFAULT_CSV_PATH,
+            help="CSV file to import, or '-' to read from stdin "
+                 "(defaults to the bundled initial_fleet.csv).",
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of CSV rows written per transaction (default: 1000).',
+        )
+        parser.add_argument(
+            '--upsert',
+            action='store_true',
+            help='Update assets that already exist (matched on VIN, licences on reg_no) '
+                 'instead of failing on them, so the same file can be re-imported.',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Split the file into byte ranges and import them in this many processes, '
+                 'each with its own database connection. Requires --path to be a file '
+                 'without line breaks inside quoted values.',
+        )
+
     def convert_date_format(self, date_str, input_format='%Y/%m/%d', output_format='%Y-%m-%d'):
         """Converts date from CSV to match Django's format, returns None if empty"""
         if not date_str or date_str.strip() == '':
@@ -41,76 +165,315 @@ class Command(BaseCommand):
             print(f"Invalid integer value: {value}. Defaulting to None.")
             return None
 
+    def parse_row(self, row):
+        """Converts a CSV row into field values for each model, None for absent records"""
+        loan_terms = self.handle_integer_field(row.get('loan_terms'))
+        installments = self.handle_decimal_field(row.get('installments'))
+
+        parsed = {
+            'asset': {
+                'year': self.handle_integer_field(row.get('year')),
+                'make': row.get('make'),
+                'model': row.get('model'),
+                'vehicle_type': row.get('vehicle_type'),
+                'sub_category': row.get('sub_category'),
+                'classification': row.get('classification'),
+                'status': row.get('status'),
+                'vin': row.get('vin'),
+            },
+            'purchase': {
+                'purchase_date': self.convert_date_format(row.get('purchase_date')),
+                'dealership': row.get('dealership'),
+                'invoice_no': row.get('invoice_no'),
+                'cost_price': self.handle_decimal_field(row.get('cost_price')),
+            },
+            'financing': None,
+            'licensing': None,
+        }
+
+        # Only create FinancingDetails if loan info is present
+        if row.get('funding_institution') or loan_terms or installments:
+            parsed['financing'] = {
+                'funding_institution': row.get('funding_institution') or None,
+                'loan_ref_number': row.get('loan_ref_number') or None,
+                'loan_end_date': self.convert_date_format(row.get('loan_end_date')),
+                'loan_terms': loan_terms,
+                'installments': installments,
+            }
+
+        # Only create LicensingDetails if reg_no or fleet_no is present
+        if row.get('reg_no') or row.get('fleet_no'):
+            parsed['licensing'] = {
+                'reg_no': row.get('reg_no') or None,
+                'fleet_no': row.get('fleet_no') or None,
+                'disc_fee': self.handle_decimal_field(row.get('disc_fee')),
+                'disc_expiry_date': self.convert_date_format(row.get('disc_expiry_date')),
+            }
+
+        return parsed
+
+    def assign_asset_ids(self, assets):
+        """Fills in primary keys on backends that can't return them from bulk_create (MySQL)"""
+        if all(asset.pk is not None for asset in assets):
+            return
+        ids_by_vin = dict(
+            Asset.objects.filter(vin__in=[asset.vin for asset in assets])
+            .values_list('vin', 'id')
+        )
+        for asset in assets:
+            asset.pk = ids_by_vin[asset.vin]
+
+    def write_chunk(self, rows):
+        """Writes one chunk of parsed rows with a bulk insert per model"""
+        assets = [Asset(**row['asset']) for row in rows]
+        Asset.objects.bulk_create(assets)
+        self.assign_asset_ids(assets)
+
+        purchases, financings, licences = [], [], []
+        for asset, row in zip(assets, rows):
+            purchases.append(PurchaseDetails(asset=asset, **row['purchase']))
+            if row['financing'] is not None:
+                financings.append(FinancingDetails(asset=asset, **row['financing']))
+            if row['licensing'] is not None:
+                licences.append(LicensingDetails(asset=asset, **row['licensing']))
+
+        PurchaseDetails.objects.bulk_create(purchases)
+        FinancingDetails.objects.bulk_create(financings)
+        LicensingDetails.objects.bulk_create(licences)
+
+        # bulk_create skips the save signals that keep the search index current
+        index_assets(asset.pk for asset in assets)
+        return Counter(created=len(assets))
+
+    def apply_changes(self, instance, values):
+        """Sets ``values`` on ``instance`` and returns the names of the fields that changed"""
+        changed = []
+        for name, value in values.items():
+            field = instance._meta.get_field(name)
+            value = field.to_python(value)
+            if getattr(instance, field.attname) != value:
+                setattr(instance, field.attname, value)
+                changed.append(field.name)
+        return changed
+
+    def upsert_related(self, model, pairs):
+        """Creates or updates related records given (existing instance or None, values) pairs.
+
+        Returns the asset ids whose records were created or changed.
+        """
+        new, changed, fields = [], [], set()
+        touched = set()
+        for instance, values in pairs:
+            if instance is None:
+                new.append(model(**values))
+                touched.add(values['asset_id'])
+                continue
+            changed_fields = self.apply_changes(instance, values)
+            if changed_fields:
+                changed.append(instance)
+                fields.update(changed_fields)
+                touched.add(instance.asset_id)
+
+        model.objects.bulk_create(new)
+        if changed:
+            model.objects.bulk_update(changed, fields)
+        return touched
+
+    def upsert_chunk(self, rows):
+        """Writes one chunk of parsed rows, updating records that already exist.
+
+        Existing assets are matched on VIN and licences on reg_no (or on the asset
+        when the row has no reg_no); only new rows are inserted and only rows with
+        changed values are updated.
+        """
+        # The last occurrence of a VIN in the chunk wins
+        rows = list({row['asset']['vin']: row for row in rows}.values())
+
+        existing = Asset.objects.in_bulk(
+            [row['asset']['vin'] for row in rows], field_name='vin')
+        existing_ids = [asset.pk for asset in existing.values()]
+
+        assets, new_assets, changed_assets, asset_fields = [], [], [], set()
+        for row in rows:
+            asset = existing.get(row['asset']['vin'])
+            if asset is None:
+                asset = Asset(**row['asset'])
+                new_assets.append(asset)
+            else:
+                changed_fields = self.apply_changes(asset, row['asset'])
+                if changed_fields:
+                    changed_assets.append(asset)
+                    asset_fields.update(changed_fields)
+            assets.append(asset)
+
+        Asset.objects.bulk_create(new_assets)
+        self.assign_asset_ids(new_assets)
+        if changed_assets:
+            Asset.objects.bulk_update(changed_assets, asset_fields)
+
+        purchases = {
+            purchase.asset_id: purchase
+            for purchase in PurchaseDetails.objects.filter(asset_id__in=existing_ids)
+        }
+        financings = {
+            financing.asset_id: financing
+            for financing in FinancingDetails.objects.filter(asset_id__in=existing_ids)
+        }
+        reg_nos = [row['licensing']['reg_no'] for row in rows
+                   if row['licensing'] is not None and row['licensing']['reg_no']]
+        licences_by_reg, licences_by_asset = {}, {}
+        for licence in LicensingDetails.objects.filter(
+                Q(reg_no__in=reg_nos) | Q(asset_id__in=existing_ids)):
+            if licence.reg_no:
+                licences_by_reg[licence.reg_no] = licence
+            licences_by_asset[licence.asset_id] = licence
+
+        purchase_pairs, financing_pairs, licence_pairs = [], [], []
+        for asset, row in zip(assets, rows):
+            purchase_pairs.append(
+                (purchases.get(asset.pk), {'asset_id': asset.pk, **row['purchase']}))
+            if row['financing'] is not None:
+                financing_pairs.append(
+                    (financings.get(asset.pk), {'asset_id': asset.pk, **row['financing']}))
+            if row['licensing'] is not None:
+                reg_no = row['licensing']['reg_no']
+                licence = (licences_by_reg.get(reg_no) if reg_no
+                           else licences_by_asset.get(asset.pk))
+                licence_pairs.append(
+                    (licence, {'asset_id': asset.pk, **row['licensing']}))
+
+        touched = {asset.pk for asset in changed_assets}
+        touched |= self.upsert_related(PurchaseDetails, purchase_pairs)
+        touched |= self.upsert_related(FinancingDetails, financing_pairs)
+        touched |= self.upsert_related(LicensingDetails, licence_pairs)
+
+        index_assets(touched | {asset.pk for asset in new_assets})
+        # bulk_update() doesn't apply auto_now
+        Asset.objects.filter(pk__in=touched).update(updated_at=now())
+
+        updated = len(touched.intersection(existing_ids))
+        return Counter(
+            created=len(new_assets),
+            updated=updated,
+            unchanged=len(existing) - updated,
+        )
+
+    def open_csv(self, path):
+        if path == '-':
+            return io.TextIOWrapper(sys.stdin.buffer, newline='', encoding='utf-8-sig')
+        try:
+            return open(path, newline='', encoding='utf-8-sig')
+        except OSError as e:
+            raise CommandError(f"Could not open {path}: {e}")
+
+    def import_chunk(self, rows, upsert):
+        """Writes one chunk of parsed rows in a transaction and returns its totals.
+
+        A unique VIN violation usually means another worker committed the same
+        VIN first. In upsert mode the chunk is simply retried, which now updates
+        that asset; otherwise the rows whose VIN already exists are skipped as
+        duplicates and the rest of the chunk is retried. Any other failure rolls
+        the chunk back, so its rows are retried one at a time and only the bad
+        ones are rejected.
+        """
+        write_chunk = self.upsert_chunk if upsert else self.write_chunk
+        totals = Counter()
+
+        for attempt in range(CONFLICT_RETRIES + 1):
+            try:
+                with transaction.atomic():
+                    return totals + write_chunk(rows)
+            except IntegrityError as e:
+                error = e
+                if upsert:
+                    continue
+                existing = set(
+                    Asset.objects.filter(vin__in=[row['asset']['vin'] for row in rows])
+                    .values_list('vin', flat=True)
+                )
+                if not existing:
+                    break
+                rows = [row for row in rows if row['asset']['vin'] not in existing]
+                totals['duplicate'] += len(existing)
+                if not rows:
+                    return totals
+            except (DatabaseError, ValidationError) as e:
+                error = e
+                break
+
+        if len(rows) > 1:
+            for row in rows:
+                totals += self.import_chunk([row], upsert)
+            return totals
+
+        totals['failed'] += 1
+        self.stderr.write(f"Row with VIN {rows[0]['asset']['vin']} failed: {error}")
+        return totals
+
+    def import_rows(self, reader, batch_size, upsert):
+        """Imports CSV rows from ``reader`` in chunks of ``batch_size``"""
+        totals = Counter()
+        for chunk in chunked(reader, batch_size):
+            rows = [self.parse_row(row) for row in chunk]
+            totals += self.import_chunk(rows, upsert)
+        return totals
+
+    def import_parallel(self, path, workers, batch_size, upsert):
+        """Imports byte-range shards of ``path`` in a process pool and merges the results"""
+        try:
+            fieldnames, shards = shard_csv(path, workers)
+        except OSError as e:
+            raise CommandError(f"Could not open {path}: {e}")
+        self.stdout.write(f"Column Names: {fieldnames}")
+
+        # Forked workers must not share the parent's connection
+        connections.close_all()
+
+        totals, queries = Counter(), 0
+        with ProcessPoolExecutor(max_workers=len(shards), initializer=init_worker) as pool:
+            futures = [
+                pool.submit(import_shard, path, start, end, fieldnames, batch_size, upsert)
+                for start, end in shards
+            ]
+            for future in futures:
+                shard_totals, shard_queries = future.result()
+                totals += shard_totals
+                queries += shard_queries
+        return totals, queries
+
     def handle(self, *args, **kwargs):
-        base_dir = os.path.dirname(os.path.abspath(__file__))
-        csv_file_path = os.path.join(base_dir, 'initial_fleet.csv')
-
-        with open(csv_file_path, newline='', encoding='utf-8-sig') as csvfile:
-            reader = csv.DictReader(csvfile)
-
-            print("Column Names:", reader.fieldnames)
-
-            for row in reader:
-                try:
-                    # Convert dates
-                    purchase_date = self.convert_date_format(
-                        row.get('purchase_date'))
-                    disc_expiry_date = self.convert_date_format(
-                        row.get('disc_expiry_date'))
-                    loan_end_date = self.convert_date_format(
-                        row.get('loan_end_date'))
-
-                    # Process numeric fields
-                    cost_price = self.handle_decimal_field(
-                        row.get('cost_price'))
-                    disc_fee = self.handle_decimal_field(row.get('disc_fee'))
-                    installments = self.handle_decimal_field(
-                        row.get('installments'))
-                    loan_terms = self.handle_integer_field(
-                        row.get('loan_terms'))
-
-                    # Create Asset
-                    asset = Asset.objects.create(
-                        year=self.handle_integer_field(row.get('year')),
-                        make=row.get('make'),
-                        model=row.get('model'),
-                        vehicle_type=row.get('vehicle_type'),
-                        sub_category=row.get('sub_category'),
-                        classification=row.get('classification'),
-                        status=row.get('status'),
-                        vin=row.get('vin'),
-                    )
-
-                    # Create PurchaseDetails
-                    PurchaseDetails.objects.create(
-                        purchase_date=purchase_date,
-                        dealership=row.get('dealership'),
-                        invoice_no=row.get('invoice_no'),
-                        cost_price=cost_price,
-                        asset=asset
-                    )
-
-                    # Only create FinancingDetails if loan info is present
-                    if row.get('funding_institution') or loan_terms or installments:
-                        FinancingDetails.objects.create(
-                            funding_institution=row.get(
-                                'funding_institution') or None,
-                            loan_ref_number=row.get('loan_ref_number') or None,
-                            loan_end_date=loan_end_date,
-                            loan_terms=loan_terms,
-                            installments=installments,
-                            asset=asset
-                        )
-
-                    # Only create LicensingDetails if reg_no or fleet_no is present
-                    if row.get('reg_no') or row.get('fleet_no'):
-                        LicensingDetails.objects.create(
-                            reg_no=row.get('reg_no') or None,
-                            fleet_no=row.get('fleet_no') or None,
-                            disc_fee=disc_fee,
-                            disc_expiry_date=disc_expiry_date,
-                            asset=asset
-                        )
-
-                except ValidationError as e:
-                    print(f"Validation Error: {e} in row: {row}")
+        batch_size = kwargs['batch_size']
+        if batch_size < 1:
+            raise CommandError('--batch-size must be a positive integer.')
+        workers = kwargs['workers']
+        if workers < 1:
+            raise CommandError('--workers must be a positive integer.')
+        if workers > 1 and kwargs['path'] == '-':
+            raise CommandError('--workers needs a file --path, stdin cannot be sharded.')
+
+        started = time.perf_counter()
+
+        if workers > 1:
+            totals, queries = self.import_parallel(
+                kwargs['path'], workers, batch_size, kwargs['upsert'])
+        else:
+            counter = QueryCounter()
+            with self.open_csv(kwargs['path']) as csvfile, connection.execute_wrapper(counter):
+                reader = csv.DictReader(csvfile)
+                self.stdout.write(f"Column Names: {reader.fieldnames}")
+                totals = self.import_rows(reader, batch_size, kwargs['upsert'])
+            queries = counter.count
+
+        # Bulk writes don't send the signals that keep the rollups and dashboard caches current
+        rebuild_rollups()
+
+        elapsed = time.perf_counter() - started
+        processed = totals['created'] + totals['updated'] + totals['unchanged']
+        rate = processed / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {processed} rows in {elapsed:.2f}s "
+            f"({totals['created']} created, {totals['updated']} updated, "
+            f"{totals['unchanged']} unchanged, {totals['duplicate']} duplicate, "
+            f"{totals['failed']} failed): "
+            f"{rate:.0f} rows/s, {queries} queries issued."
+        ))
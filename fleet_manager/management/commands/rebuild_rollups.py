@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from fleet_manager.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the fleet summary rollup tables from the Asset, Purchase, Financing and Licensing tables'
+
+    def handle(self, *args, **kwargs):
+        groups = rebuild_rollups()
+        summary = ", ".join(f"{name}: {count} groups" for name, count in groups.items())
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt rollups ({summary})."))
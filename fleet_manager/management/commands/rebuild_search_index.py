@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from fleet_manager.models import Asset
+from fleet_manager.search import index_assets
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the asset search index from the Asset and LicensingDetails tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of assets re-indexed per transaction (default: 1000).',
+        )
+
+    def handle(self, *args, **kwargs):
+        batch_size = kwargs['batch_size']
+        last_id = indexed = 0
+
+        while True:
+            asset_ids = list(
+                Asset.objects.filter(id__gt=last_id).order_by('id')
+                .values_list('id', flat=True)[:batch_size]
+            )
+            if not asset_ids:
+                break
+            with transaction.atomic():
+                index_assets(asset_ids)
+            indexed += len(asset_ids)
+            last_id = asset_ids[-1]
+
+        self.stdout.write(self.style.SUCCESS(f"Indexed {indexed} assets."))
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:17
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fleet_manager', '0003_alter_licensingdetails_fleet_no'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExportJob',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('vehicle_type', models.CharField(default='all', max_length=100)),
+                ('export_format', models.CharField(default='csv', max_length=20)),
+                ('columns', models.CharField(max_length=500)),
+                ('status', models.CharField(choices=[('Queued', 'Queued'), ('Running', 'Running'), ('Done', 'Done'), ('Failed', 'Failed')], default='Queued', max_length=20)),
+                ('rows_written', models.IntegerField(default=0)),
+                ('total_rows', models.IntegerField(blank=True, null=True)),
+                ('file', models.FileField(blank=True, upload_to='exports/')),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
@@ -0,0 +1,81 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:19
+
+import re
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# A frozen copy of fleet_manager.search's tokenizer as it was when the index was
+# added, so later changes to the app code can't change what this migration does.
+FIELD_WEIGHTS = {
+    'vin': 5,
+    'reg_no': 5,
+    'fleet_no': 4,
+    'make': 3,
+    'model': 2,
+}
+
+WORD_RE = re.compile(r'[a-z0-9]+')
+
+
+def field_tokens(value):
+    words = WORD_RE.findall((value or '').lower())[:20]
+    if len(words) > 1:
+        words.append(''.join(words))
+    return words
+
+
+def asset_tokens(asset, licences):
+    values = [(asset.make, 'make'), (asset.model, 'model'), (asset.vin, 'vin')]
+    for licence in licences:
+        values.append((licence.reg_no, 'reg_no'))
+        values.append((licence.fleet_no, 'fleet_no'))
+
+    tokens = {}
+    for value, field in values:
+        for token in field_tokens(value):
+            token = token[:100]
+            tokens[token] = max(tokens.get(token, 0), FIELD_WEIGHTS[field])
+    return tokens
+
+
+def build_search_index(apps, schema_editor):
+    Asset = apps.get_model('fleet_manager', 'Asset')
+    LicensingDetails = apps.get_model('fleet_manager', 'LicensingDetails')
+    AssetSearchToken = apps.get_model('fleet_manager', 'AssetSearchToken')
+
+    licences = {}
+    for licence in LicensingDetails.objects.only('reg_no', 'fleet_no', 'asset_id').iterator():
+        licences.setdefault(licence.asset_id, []).append(licence)
+
+    entries = []
+    for asset in Asset.objects.only('make', 'model', 'vin').iterator():
+        for token, weight in asset_tokens(asset, licences.get(asset.id, [])).items():
+            entries.append(AssetSearchToken(asset_id=asset.id, token=token, weight=weight))
+        if len(entries) >= 5000:
+            AssetSearchToken.objects.bulk_create(entries)
+            entries = []
+    AssetSearchToken.objects.bulk_create(entries)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fleet_manager', '0004_exportjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AssetSearchToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(max_length=100)),
+                ('weight', models.PositiveSmallIntegerField(default=1)),
+                ('asset', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_tokens', to='fleet_manager.asset')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['token', 'asset'], name='search_token_asset_idx')],
+            },
+        ),
+        migrations.RunPython(build_search_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fleet_manager', '0005_assetsearchtoken'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='asset',
+            index=models.Index(fields=['status', 'vehicle_type', 'id'], name='asset_status_type_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='asset',
+            index=models.Index(fields=['status', 'id'], name='asset_status_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='licensingdetails',
+            index=models.Index(fields=['disc_expiry_date'], name='licence_expiry_idx'),
+        ),
+    ]
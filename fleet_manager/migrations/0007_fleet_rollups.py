@@ -0,0 +1,86 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:24
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import ExtractMonth
+
+
+def build_rollups(apps, schema_editor):
+    """Fills the rollup tables from the existing fleet, a frozen copy of rollups.rebuild_rollups()."""
+    Asset = apps.get_model('fleet_manager', 'Asset')
+    FinancingDetails = apps.get_model('fleet_manager', 'FinancingDetails')
+    LicensingDetails = apps.get_model('fleet_manager', 'LicensingDetails')
+    VehicleTypeRollup = apps.get_model('fleet_manager', 'VehicleTypeRollup')
+    FundingRollup = apps.get_model('fleet_manager', 'FundingRollup')
+    ExpiryMonthRollup = apps.get_model('fleet_manager', 'ExpiryMonthRollup')
+
+    def amount(row):
+        # SQLite sums decimals as floats; round to the rollup columns' 3 places
+        return Decimal(row['amount'] or 0).quantize(Decimal('0.001'))
+
+    vehicles = Asset.objects.values('vehicle_type', 'status').annotate(
+        count=Count('id'), amount=Sum('purchasedetails__cost_price')).order_by()
+    VehicleTypeRollup.objects.bulk_create([
+        VehicleTypeRollup(vehicle_type=row['vehicle_type'], status=row['status'],
+                          asset_count=row['count'], total_cost=amount(row))
+        for row in vehicles
+    ])
+
+    funders = FinancingDetails.objects.values('funding_institution').annotate(
+        count=Count('id'), amount=Sum('installments')).order_by()
+    FundingRollup.objects.bulk_create([
+        FundingRollup(funding_institution=row['funding_institution'],
+                      financed_count=row['count'], total_installments=amount(row))
+        for row in funders
+    ])
+
+    months = LicensingDetails.objects.values(month=ExtractMonth('disc_expiry_date')).annotate(
+        count=Count('id'), amount=Sum('disc_fee')).order_by()
+    ExpiryMonthRollup.objects.bulk_create([
+        ExpiryMonthRollup(month=row['month'] or 0, disc_count=row['count'], total_fees=amount(row))
+        for row in months
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fleet_manager', '0006_list_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExpiryMonthRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.PositiveSmallIntegerField(unique=True)),
+                ('disc_count', models.IntegerField(default=0)),
+                ('total_fees', models.DecimalField(decimal_places=3, default=0, max_digits=20)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='FundingRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('funding_institution', models.CharField(max_length=100, unique=True)),
+                ('financed_count', models.IntegerField(default=0)),
+                ('total_installments', models.DecimalField(decimal_places=3, default=0, max_digits=20)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='VehicleTypeRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('vehicle_type', models.CharField(max_length=100)),
+                ('status', models.CharField(max_length=100)),
+                ('asset_count', models.IntegerField(default=0)),
+                ('total_cost', models.DecimalField(decimal_places=3, default=0, max_digits=20)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('vehicle_type', 'status'), name='unique_vehicle_type_rollup')],
+            },
+        ),
+        migrations.RunPython(build_rollups, migrations.RunPython.noop),
+    ]
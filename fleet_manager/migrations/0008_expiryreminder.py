@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fleet_manager', '0007_fleet_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExpiryReminder',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('disc_expiry_date', models.DateField()),
+                ('sent_at', models.DateTimeField(auto_now_add=True)),
+                ('licence', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='expiry_reminders', to='fleet_manager.licensingdetails')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['disc_expiry_date'], name='expiry_reminder_date_idx')],
+                'constraints': [models.UniqueConstraint(fields=('licence', 'disc_expiry_date'), name='unique_expiry_reminder')],
+            },
+        ),
+    ]
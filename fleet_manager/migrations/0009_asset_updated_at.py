@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fleet_manager', '0008_expiryreminder'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='asset',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fleet_manager', '0009_asset_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='asset',
+            name='version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fleet_manager', '0010_asset_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='avatar_thumbnails',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
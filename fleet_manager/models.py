@@ -1,5 +1,10 @@
+import uuid
+
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.templatetags.static import static
+
+from .avatars import avatar_sources
 
 
 def user_profile_pic_path(instance, filename):
@@ -7,23 +12,38 @@ def user_profile_pic_path(instance, filename):
     return f'profile_pics/{instance.username}/{filename}'
 
 
+# Profile picture of users who haven't uploaded one; shown as the static avatar
+DEFAULT_PROFILE_PICTURE = "profile_pics/avator.png"
+
+
 class User(AbstractUser):
     profile_picture = models.ImageField(
         upload_to=user_profile_pic_path,
         blank=True,
         null=True,
-        default="profile_pics/avator.png",
+        default=DEFAULT_PROFILE_PICTURE,
     )
+    # {size: {format: storage name}} of the resized avatars, see avatars.py
+    avatar_thumbnails = models.JSONField(default=dict, blank=True, editable=False)
 
     def __str__(self):
         return self.username
 
+    @property
+    def has_uploaded_picture(self):
+        return bool(self.profile_picture) and self.profile_picture.name != DEFAULT_PROFILE_PICTURE
+
     @property
     def profile_picture_url(self):
         """Returns the URL of the profile picture or the default image."""
-        if self.profile_picture:
+        if self.has_uploaded_picture:
             return self.profile_picture.url
-        return "/media/profile_pics/avator.png"
+        return static("fleet_manager/images/avator.png")
+
+    @property
+    def avatar_sources(self):
+        """The srcsets of the avatar thumbnails, or None until they have been made."""
+        return avatar_sources(self.avatar_thumbnails) if self.has_uploaded_picture else None
 
 
 class Asset(models.Model):
@@ -35,6 +55,17 @@ class Asset(models.Model):
     classification = models.CharField(max_length=100)
     status = models.CharField(max_length=100)
     vin = models.CharField(max_length=100, unique=True)
+    # Also bumped when the asset's purchase, financing or licensing records change (signals.py)
+    updated_at = models.DateTimeField(auto_now=True)
+    # Incremented by every edit; edits made against an older version are rejected
+    version = models.PositiveIntegerField(default=1)
+
+    class Meta:
+        indexes = [
+            # List views and exports filter on status (and vehicle_type), paging by id
+            models.Index(fields=["status", "vehicle_type", "id"], name="asset_status_type_id_idx"),
+            models.Index(fields=["status", "id"], name="asset_status_id_idx"),
+        ]
 
 
 class PurchaseDetails(models.Model):
@@ -69,5 +100,114 @@ class LicensingDetails(models.Model):
     disc_expiry_date = models.DateField(null=True, blank=True)
     asset = models.ForeignKey(Asset, on_delete=models.CASCADE)
 
+    class Meta:
+        indexes = [
+            # The licensing page orders by expiry and the reminder task range-scans it
+            models.Index(fields=["disc_expiry_date"], name="licence_expiry_idx"),
+        ]
+
     def __str__(self):
         return f"License for {self.asset} (Reg: {self.reg_no})"
+
+
+class ExportJob(models.Model):
+    """An asset export written to MEDIA_ROOT by a django_q task."""
+
+    STATUS_CHOICES = [
+        ("Queued", "Queued"),
+        ("Running", "Running"),
+        ("Done", "Done"),
+        ("Failed", "Failed"),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    vehicle_type = models.CharField(max_length=100, default="all")
+    export_format = models.CharField(max_length=20, default="csv")
+    columns = models.CharField(max_length=500)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="Queued")
+    rows_written = models.IntegerField(default=0)
+    total_rows = models.IntegerField(null=True, blank=True)
+    file = models.FileField(upload_to="exports/", blank=True)
+    error = models.TextField(blank=True)
+    created_by = models.ForeignKey(
+        User, on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.export_format.upper()} export of {self.vehicle_type} assets ({self.status})"
+
+    @property
+    def progress(self):
+        """Percentage of rows written, None until the total is known."""
+        if not self.total_rows:
+            return 100 if self.status == "Done" else None
+        return min(100, round(self.rows_written * 100 / self.total_rows))
+
+
+class AssetSearchToken(models.Model):
+    """Inverted search index entry: one normalised word of an asset's make, model, VIN or licence numbers."""
+
+    token = models.CharField(max_length=100)
+    weight = models.PositiveSmallIntegerField(default=1)
+    asset = models.ForeignKey(Asset, on_delete=models.CASCADE, related_name="search_tokens")
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["token", "asset"], name="search_token_asset_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.token} -> {self.asset_id}"
+
+
+class VehicleTypeRollup(models.Model):
+    """Number and total cost of assets per vehicle type and status, maintained by rollups.py."""
+
+    vehicle_type = models.CharField(max_length=100)
+    status = models.CharField(max_length=100)
+    asset_count = models.IntegerField(default=0)
+    total_cost = models.DecimalField(max_digits=20, decimal_places=3, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["vehicle_type", "status"], name="unique_vehicle_type_rollup"),
+        ]
+
+
+class FundingRollup(models.Model):
+    """Number of financing records and total installments per funding institution."""
+
+    funding_institution = models.CharField(max_length=100, unique=True)
+    financed_count = models.IntegerField(default=0)
+    total_installments = models.DecimalField(max_digits=20, decimal_places=3, default=0)
+
+
+class ExpiryMonthRollup(models.Model):
+    """Number of licence discs and total renewal fees per expiry month (0 when no expiry date)."""
+
+    month = models.PositiveSmallIntegerField(unique=True)
+    disc_count = models.IntegerField(default=0)
+    total_fees = models.DecimalField(max_digits=20, decimal_places=3, default=0)
+
+
+class ExpiryReminder(models.Model):
+    """Notification ledger: a licence was included in a reminder digest for this disc expiry date.
+
+    A renewed licence has a new expiry date, so it is reminded again when that date comes up.
+    """
+
+    licence = models.ForeignKey(LicensingDetails, on_delete=models.CASCADE, related_name="expiry_reminders")
+    disc_expiry_date = models.DateField()
+    sent_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["licence", "disc_expiry_date"], name="unique_expiry_reminder"),
+        ]
+        indexes = [
+            models.Index(fields=["disc_expiry_date"], name="expiry_reminder_date_idx"),
+        ]
+
+    def __str__(self):
+        return f"Reminder for {self.licence_id} expiring {self.disc_expiry_date}"
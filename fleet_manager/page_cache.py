@@ -0,0 +1,151 @@
+"""Rendered page and fragment caching keyed on per-model data versions.
+
+Each fleet model has a version number in the cache, bumped by bump_data_versions()
+whenever its rows are written (signals.py, bulk.py and rebuild_rollups() call it
+next to invalidate_summaries()). Cache keys include the versions of the models
+a page or fragment is built from, so a write makes the old entries unreachable
+instead of deleting them, and hot pages are served without querying the
+database until the data changes.
+
+cache_anonymous_page() caches whole responses for anonymous GET requests. Pages
+are keyed on the GET parameters the view reads, so other parameters (tracking
+tags, cache busters) can't fill the cache with copies of the same page. The
+layout embeds a CSRF token, which is per visitor, so cached pages hold a
+placeholder that is replaced with the visitor's own token when served.
+acached_fragment() caches parts of pages for everyone, such as the table body of
+a list page.
+
+Like the summaries, versions live in Django's cache: use the file or database
+backend (CACHE_BACKEND) so a write in one process is seen by the others.
+"""
+
+import hashlib
+import time
+from datetime import date
+from functools import wraps
+from urllib.parse import urlencode
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.middleware.csrf import get_token
+
+# Models whose writes change what the pages show
+VERSIONED_MODELS = ("Asset", "PurchaseDetails", "FinancingDetails", "LicensingDetails")
+
+# Seconds a page or fragment is kept; entries normally become unreachable sooner, on the next write
+PAGE_CACHE_SECONDS = 3600
+
+CSRF_PLACEHOLDER = "__fleet_csrf_token__"
+
+# Representations a page can be served in; a request's Accept header is reduced to the one it prefers
+PAGE_CONTENT_TYPES = ["text/html", "application/json"]
+
+
+def version_key(model_name):
+    return f"data_version:{model_name}"
+
+
+def bump_data_versions(*model_names):
+    """Moves the given models, or all of them, to a new data version."""
+    for name in model_names or VERSIONED_MODELS:
+        try:
+            cache.incr(version_key(name))
+        except ValueError:
+            # Never set or evicted; start from the clock so no earlier version is reused
+            cache.set(version_key(name), time.time_ns(), None)
+
+
+def version_token(versions, model_names):
+    missing = {version_key(name): time.time_ns() for name in model_names if version_key(name) not in versions}
+    return ".".join(str(versions.get(version_key(name)) or missing[version_key(name)]) for name in model_names), missing
+
+
+def data_version(*model_names):
+    """Returns a token that changes whenever any of the given models is written."""
+    token, missing = version_token(cache.get_many([version_key(name) for name in model_names]), model_names)
+    if missing:
+        cache.set_many(missing, None)
+    return token
+
+
+async def adata_version(*model_names):
+    token, missing = version_token(
+        await cache.aget_many([version_key(name) for name in model_names]), model_names)
+    if missing:
+        await cache.aset_many(missing, None)
+    return token
+
+
+def page_key(request, version, params):
+    # Only the non-empty ``params`` count, in a fixed order, so equivalent URLs share one entry
+    query = urlencode(sorted((name, request.GET[name]) for name in params if request.GET.get(name)))
+    # Today's date is part of the key, as pages flag discs expiring within 30 days
+    parts = [request.path, query, request.get_preferred_type(PAGE_CONTENT_TYPES) or "", version,
+             date.today().isoformat()]
+    return "page:" + hashlib.md5("|".join(parts).encode()).hexdigest()
+
+
+def csrf_placeholder(request):
+    """Context processor that renders {% csrf_token %} as CSRF_PLACEHOLDER while a page is being cached."""
+    return {"csrf_token": CSRF_PLACEHOLDER} if getattr(request, "caching_page", False) else {}
+
+
+def is_cacheable(response):
+    return response.status_code == 200 and not response.streaming and not response.cookies
+
+
+def with_csrf_token(request, response):
+    response.content = response.content.replace(CSRF_PLACEHOLDER.encode(), get_token(request).encode())
+    return response
+
+
+def cache_anonymous_page(*model_names, params=()):
+    """Caches a view's responses to anonymous GET requests until any of the given models is written.
+
+    ``params`` names the GET parameters the view reads; any others are left out of the cache key.
+    """
+    def decorator(view):
+        if iscoroutinefunction(view):
+            async def wrapper(request, *args, **kwargs):
+                if request.method != "GET" or (await request.auser()).is_authenticated:
+                    return await view(request, *args, **kwargs)
+                key = page_key(request, await adata_version(*model_names), params)
+                response = await cache.aget(key)
+                if response is None:
+                    request.caching_page = True
+                    response = await view(request, *args, **kwargs)
+                    if is_cacheable(response):
+                        await cache.aset(key, response, PAGE_CACHE_SECONDS)
+                return with_csrf_token(request, response)
+
+            wrapper = markcoroutinefunction(wrapper)
+        else:
+            def wrapper(request, *args, **kwargs):
+                if request.method != "GET" or request.user.is_authenticated:
+                    return view(request, *args, **kwargs)
+                key = page_key(request, data_version(*model_names), params)
+                response = cache.get(key)
+                if response is None:
+                    request.caching_page = True
+                    response = view(request, *args, **kwargs)
+                    if is_cacheable(response):
+                        cache.set(key, response, PAGE_CACHE_SECONDS)
+                return with_csrf_token(request, response)
+
+        return wraps(view)(wrapper)
+    return decorator
+
+
+async def acached_fragment(name, model_names, vary_on, arender):
+    """Returns the cached result of ``await arender()`` for the fragment, rendering it on a miss.
+
+    Keys are built like the {% cache %} tag's, from the fragment name, the data
+    version of ``model_names`` and ``vary_on``.
+    """
+    key = make_template_fragment_key(name, [await adata_version(*model_names), *vary_on])
+    fragment = await cache.aget(key)
+    if fragment is None:
+        fragment = await arender()
+        await cache.aset(key, fragment, PAGE_CACHE_SECONDS)
+    return fragment
@@ -0,0 +1,135 @@
+"""Keyset (seek) pagination by primary key with opaque cursors.
+
+Every page is a single indexed range query, ``WHERE id > ? ORDER BY id LIMIT n``
+(or the reverse for previous pages), so deep pages cost the same as the first.
+Total counts are cached until the data changes instead of being recomputed on
+every page.
+"""
+
+import hashlib
+
+from django.core import signing
+from django.core.cache import cache
+from django.core.paginator import Paginator
+
+from .page_cache import adata_version, data_version
+
+CURSOR_SALT = "fleet_manager.pagination"
+
+# Seconds a list's total count is reused before it is recounted
+COUNT_CACHE_SECONDS = 300
+
+
+def make_cursor(**position):
+    return signing.dumps(position, salt=CURSOR_SALT, compress=True)
+
+
+def read_cursor(token):
+    """Returns the cursor's position dict, or {} for a missing or tampered cursor."""
+    if not token:
+        return {}
+    try:
+        position = signing.loads(token, salt=CURSOR_SALT)
+    except signing.BadSignature:
+        return {}
+    return position if isinstance(position, dict) else {}
+
+
+def count_key(queryset, version):
+    # The data version makes a write start a fresh count instead of serving a stale one
+    return "keyset_count:" + hashlib.md5(f"{queryset.query}|{version}".encode()).hexdigest()
+
+
+def cached_count(queryset, models=("Asset",)):
+    """Returns the queryset's row count, cached per query for COUNT_CACHE_SECONDS or until ``models`` change."""
+    key = count_key(queryset, data_version(*models))
+    return cache.get_or_set(key, queryset.count, COUNT_CACHE_SECONDS)
+
+
+async def acached_count(queryset, models=("Asset",)):
+    key = count_key(queryset, await adata_version(*models))
+    count = await cache.aget(key)
+    if count is None:
+        count = await queryset.acount()
+        await cache.aset(key, count, COUNT_CACHE_SECONDS)
+    return count
+
+
+class KeysetPage:
+    def __init__(self, object_list, has_next, has_previous, total_count):
+        self.object_list = object_list
+        self.has_next = has_next
+        self.has_previous = has_previous
+        self.total_count = total_count
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    @property
+    def next_cursor(self):
+        if not (self.has_next and self.object_list):
+            return None
+        return make_cursor(after=self.object_list[-1].pk)
+
+    @property
+    def previous_cursor(self):
+        if not (self.has_previous and self.object_list):
+            return None
+        return make_cursor(before=self.object_list[0].pk)
+
+    @property
+    def last_cursor(self):
+        return make_cursor(last=True)
+
+
+def keyset_rows(queryset, position, per_page):
+    """Returns the query for a page's rows plus one, which tells whether there is another page."""
+    if "before" in position or "last" in position:
+        # Walk backwards from the cursor; keyset_page() restores ascending order
+        rows = queryset.order_by("-pk")
+        if "before" in position:
+            rows = rows.filter(pk__lt=position["before"])
+        return rows[:per_page + 1]
+
+    rows = queryset.order_by("pk")
+    if "after" in position:
+        rows = rows.filter(pk__gt=position["after"])
+    return rows[:per_page + 1]
+
+
+def keyset_page(rows, position, per_page, total_count):
+    if "before" in position or "last" in position:
+        has_previous = len(rows) > per_page
+        return KeysetPage(rows[:per_page][::-1], "before" in position, has_previous, total_count)
+    return KeysetPage(rows[:per_page], len(rows) > per_page, "after" in position, total_count)
+
+
+def keyset_paginate(queryset, cursor, per_page=10, models=("Asset",)):
+    """Returns the KeysetPage of ``queryset`` (ordered by id) that the cursor token points to.
+
+    ``models`` are the models whose writes can change the queryset's total count.
+    """
+    position = read_cursor(cursor)
+    total_count = cached_count(queryset, models)
+    rows = list(keyset_rows(queryset, position, per_page))
+    return keyset_page(rows, position, per_page, total_count)
+
+
+async def akeyset_paginate(queryset, cursor, per_page=10, models=("Asset",)):
+    position = read_cursor(cursor)
+    total_count = await acached_count(queryset, models)
+    rows = [row async for row in keyset_rows(queryset, position, per_page)]
+    return keyset_page(rows, position, per_page, total_count)
+
+
+async def aget_page(queryset, number, per_page):
+    """Async Paginator.get_page(): counts the queryset and loads the page with the async ORM."""
+    paginator = Paginator(queryset, per_page)
+    # count is a cached_property; setting it keeps the paginator from running a sync count()
+    paginator.count = await queryset.acount()
+    page = paginator.get_page(number)
+    page.object_list = [row async for row in page.object_list]
+    return page
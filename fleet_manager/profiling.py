@@ -0,0 +1,140 @@
+"""Opt-in per-request profiling for the fleet_manager views.
+
+With FLEET_PROFILING enabled, ProfilingMiddleware logs one line per request to
+a fleet_manager route. The line gives wall time, SQL query count and time,
+template render time, and any query run FLEET_PROFILING_DUPLICATE_THRESHOLD or
+more times. A query repeated that often with different parameters is usually
+an N+1 lookup such as ``disc.asset`` in a loop. The same timings are sent in a
+Server-Timing header, so they show up in the browser's network panel.
+
+A FLEET_PROFILING_SAMPLE_RATE fraction of requests also runs under cProfile.
+Their stats are dumped to FLEET_PROFILING_DIR for ``python -m pstats`` or
+snakeviz.
+
+When FLEET_PROFILING is off the middleware raises MiddlewareNotUsed, so Django
+drops it from the stack and requests pay nothing.
+"""
+
+import contextvars
+import cProfile
+import logging
+import random
+import time
+from collections import Counter
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from django.template.backends.django import Template
+
+logger = logging.getLogger("fleet_manager.profiling")
+
+# Template render time of the request being profiled, in seconds
+_template_time = contextvars.ContextVar("fleet_profiling_template_time", default=None)
+_original_render = Template.render
+
+
+def timed_render(self, context=None, request=None):
+    elapsed = _template_time.get()
+    if elapsed is None:
+        return _original_render(self, context, request)
+    # Nested renders ({% include %} goes through the same Template) are counted by their outermost call
+    _template_time.set(None)
+    started = time.perf_counter()
+    try:
+        return _original_render(self, context, request)
+    finally:
+        _template_time.set(elapsed + time.perf_counter() - started)
+
+
+class QueryRecorder:
+    """Connection execute wrapper that records each statement's SQL and duration."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, time.perf_counter() - started))
+
+    @property
+    def total_time(self):
+        return sum(duration for _, duration in self.queries)
+
+    def duplicates(self, threshold):
+        """Returns [(count, sql)] for statements run at least ``threshold`` times, most repeated first."""
+        counts = Counter(sql for sql, _ in self.queries)
+        return [(count, sql) for sql, count in counts.most_common() if count >= threshold]
+
+
+def is_fleet_view(request):
+    match = getattr(request, "resolver_match", None)
+    return match is not None and match.func.__module__.startswith("fleet_manager.")
+
+
+class ProfilingMiddleware:
+    def __init__(self, get_response):
+        if not settings.FLEET_PROFILING:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.sample_rate = settings.FLEET_PROFILING_SAMPLE_RATE
+        self.threshold = settings.FLEET_PROFILING_DUPLICATE_THRESHOLD
+        self.profile_dir = Path(settings.FLEET_PROFILING_DIR)
+        Template.render = timed_render
+
+    def __call__(self, request):
+        recorder = QueryRecorder()
+        profiler = self.start_profiler() if random.random() < self.sample_rate else None
+        token = _template_time.set(0.0)
+        started = time.perf_counter()
+        try:
+            with connection.execute_wrapper(recorder):
+                try:
+                    response = self.get_response(request)
+                finally:
+                    if profiler:
+                        profiler.disable()
+        finally:
+            template_time = _template_time.get() or 0.0
+            _template_time.reset(token)
+        total = time.perf_counter() - started
+
+        if not is_fleet_view(request):
+            return response
+
+        route = request.resolver_match.view_name
+        duplicates = recorder.duplicates(self.threshold)
+        response["Server-Timing"] = (
+            f'total;dur={total * 1000:.1f}, '
+            f'db;dur={recorder.total_time * 1000:.1f};desc="{len(recorder.queries)} queries", '
+            f'tpl;dur={template_time * 1000:.1f}'
+        )
+        logger.log(
+            logging.WARNING if duplicates else logging.INFO,
+            "%s %s (%s) %s: %.1fms, %d queries in %.1fms, templates %.1fms%s",
+            request.method, request.path, route, response.status_code, total * 1000,
+            len(recorder.queries), recorder.total_time * 1000, template_time * 1000,
+            "".join(f"\n  repeated {count}x: {sql}" for count, sql in duplicates),
+        )
+        if profiler:
+            self.dump(profiler, route)
+        return response
+
+    def start_profiler(self):
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Python 3.12+ allows one active profiler per process; this request goes unsampled
+            return None
+        return profiler
+
+    def dump(self, profiler, route):
+        self.profile_dir.mkdir(parents=True, exist_ok=True)
+        path = self.profile_dir / f"{route.replace(':', '-')}-{time.time_ns()}.prof"
+        profiler.dump_stats(path)
+        logger.info("cProfile stats written to %s", path)
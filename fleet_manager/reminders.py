@@ -0,0 +1,99 @@
+"""Licence expiry reminder digests.
+
+Expiring licences are grouped by fleet group (the prefix of their fleet number)
+and the recipients configured for that group in EXPIRY_REMINDER_RECIPIENTS.
+Each recipient list gets one digest email listing its licences, instead of one
+email per licence. Digests are sent in chunks over a single mail connection.
+"""
+
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.template.loader import render_to_string
+
+# Licences listed in one email; larger digests are split into numbered parts
+MAX_LICENCES_PER_DIGEST = 200
+
+# Messages handed to the mail connection per send_messages() call
+SEND_CHUNK_SIZE = 25
+
+
+def fleet_group(fleet_no):
+    """Returns the fleet group of a fleet number, e.g. "SIM" for "SIM 001"."""
+    return (fleet_no or "").split(" ")[0].upper() or "UNASSIGNED"
+
+
+def recipients_for(group):
+    recipients = settings.EXPIRY_REMINDER_RECIPIENTS
+    return tuple(recipients.get(group) or recipients["default"])
+
+
+class Digest:
+    """One reminder email: its recipients and the licences it lists."""
+
+    def __init__(self, recipients, licences, part=1, parts=1):
+        self.recipients = recipients
+        self.licences = licences
+        self.part = part
+        self.parts = parts
+
+    @property
+    def licence_ids(self):
+        return [licence.pk for licence in self.licences]
+
+    def message(self, connection=None):
+        groups = defaultdict(list)
+        for licence in self.licences:
+            groups[fleet_group(licence.fleet_no)].append(licence)
+
+        subject = f"Vehicle Expiry Reminder - {len(self.licences)} license discs"
+        if self.parts > 1:
+            subject += f" ({self.part}/{self.parts})"
+        body = render_to_string("fleet_manager/emails/expiry_reminder_digest.txt", {
+            "groups": sorted(groups.items()),
+            "count": len(self.licences),
+        })
+        return EmailMessage(
+            subject=subject,
+            body=body,
+            from_email=settings.EXPIRY_REMINDER_FROM_EMAIL,
+            to=list(self.recipients),
+            connection=connection,
+        )
+
+
+def build_digests(licences):
+    """Groups licences (with their assets loaded) into Digests, ordered by recipients then expiry date."""
+    by_recipients = defaultdict(list)
+    for licence in licences:
+        by_recipients[recipients_for(fleet_group(licence.fleet_no))].append(licence)
+
+    digests = []
+    for recipients, group_licences in sorted(by_recipients.items()):
+        group_licences.sort(key=lambda licence: (licence.disc_expiry_date, licence.pk))
+        parts = [
+            group_licences[start:start + MAX_LICENCES_PER_DIGEST]
+            for start in range(0, len(group_licences), MAX_LICENCES_PER_DIGEST)
+        ]
+        digests.extend(
+            Digest(recipients, part, number, len(parts)) for number, part in enumerate(parts, 1)
+        )
+    return digests
+
+
+def send_digests(digests, deadline=None, clock=None, on_sent=None):
+    """Sends digests in chunks over one connection, stopping before a chunk once ``clock()`` passes ``deadline``.
+
+    ``on_sent`` is called with each chunk once it has been sent. Returns the digests that were not sent.
+    """
+    remaining = list(digests)
+    with get_connection(fail_silently=False) as connection:
+        while remaining:
+            if deadline is not None and clock() >= deadline:
+                break
+            chunk, remaining = remaining[:SEND_CHUNK_SIZE], remaining[SEND_CHUNK_SIZE:]
+            connection.send_messages([digest.message(connection) for digest in chunk])
+            if on_sent:
+                on_sent(chunk)
+    return remaining
@@ -0,0 +1,254 @@
+"""Materialised fleet summaries, kept up to date with per-row deltas.
+
+VehicleTypeRollup, FundingRollup and ExpiryMonthRollup hold one row per
+summary group, so the dashboard, finance and licensing pages read a handful of
+rows instead of aggregating the whole fleet. Signal handlers in signals.py call
+the *_saved / *_deleted functions below, which move a record's contribution
+between groups with ``F()`` updates inside a transaction.
+
+An asset counts towards its (vehicle_type, status) group and its purchase adds
+its cost price to the same group, so moving an asset moves its cost with it.
+
+Bulk writes (import_assets, the benchmark seeder, queryset updates) send no
+signals; those callers run rebuild_rollups() afterwards, and large cascading
+deletes run inside deferred_rollups() to skip the per-row deltas. The
+check_rollups command compares the tables with live aggregates.
+"""
+
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from decimal import Decimal
+
+from django.apps import apps
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import ExtractMonth
+
+from .page_cache import bump_data_versions
+from .summaries import invalidate_summaries
+
+# Rollup model -> (key fields, (count field, amount field))
+ROLLUP_FIELDS = {
+    "VehicleTypeRollup": (("vehicle_type", "status"), ("asset_count", "total_cost")),
+    "FundingRollup": (("funding_institution",), ("financed_count", "total_installments")),
+    "ExpiryMonthRollup": (("month",), ("disc_count", "total_fees")),
+}
+
+AMOUNT_PLACES = Decimal("0.001")
+
+_deferred = threading.local()
+
+
+@contextmanager
+def deferred_rollups():
+    """Skips per-row deltas inside the block and rebuilds the rollups once it exits."""
+    _deferred.depth = getattr(_deferred, "depth", 0) + 1
+    try:
+        yield
+    finally:
+        _deferred.depth -= 1
+    if not _deferred.depth:
+        rebuild_rollups()
+
+
+def is_deferred():
+    return getattr(_deferred, "depth", 0) > 0
+
+
+def fleet_model(name):
+    return apps.get_model("fleet_manager", name)
+
+
+def field_value(instance, name):
+    """Returns the instance's value for ``name`` as the field's Python type (forms may assign strings)."""
+    return instance._meta.get_field(name).to_python(getattr(instance, name))
+
+
+def expiry_month(value):
+    # Month 0 collects licences without an expiry date
+    return value.month if value else 0
+
+
+def apply_delta(name, key, count, amount):
+    """Adds ``count`` and ``amount`` to the rollup row for ``key``, creating it if needed."""
+    if not count and not amount:
+        return
+    model = fleet_model(name)
+    count_field, amount_field = ROLLUP_FIELDS[name][1]
+    changes = {count_field: F(count_field) + count, amount_field: F(amount_field) + (amount or 0)}
+
+    with transaction.atomic():
+        if model.objects.filter(**key).update(**changes):
+            return
+        try:
+            with transaction.atomic():
+                model.objects.create(**key, **{count_field: count, amount_field: amount or 0})
+        except IntegrityError:
+            # Another writer created the row first
+            model.objects.filter(**key).update(**changes)
+
+
+def asset_group(asset_id):
+    """Returns the (vehicle_type, status) key of an asset, or None if it no longer exists."""
+    Asset = fleet_model("Asset")
+    return Asset.objects.filter(pk=asset_id).values("vehicle_type", "status").first()
+
+
+def stored_values(instance, *fields):
+    """Returns the instance's field values as currently saved, or None for a new row."""
+    if instance.pk is None or instance._state.adding:
+        return None
+    return type(instance).objects.filter(pk=instance.pk).values(*fields).first()
+
+
+def asset_saved(instance, previous, created):
+    group = {"vehicle_type": instance.vehicle_type, "status": instance.status}
+    if created or previous is None:
+        apply_delta("VehicleTypeRollup", group, 1, 0)
+        return
+    if previous == group:
+        return
+
+    PurchaseDetails = fleet_model("PurchaseDetails")
+    cost = PurchaseDetails.objects.filter(asset_id=instance.pk).values_list("cost_price", flat=True).first()
+    with transaction.atomic():
+        apply_delta("VehicleTypeRollup", previous, -1, -(cost or 0))
+        apply_delta("VehicleTypeRollup", group, 1, cost or 0)
+
+
+def asset_deleted(instance):
+    # The cost price leaves with the purchase, which is deleted first
+    apply_delta("VehicleTypeRollup", {"vehicle_type": instance.vehicle_type, "status": instance.status}, -1, 0)
+
+
+def assets_moved(moves):
+    """Applies the deltas of assets whose group changed in a bulk update.
+
+    ``moves`` maps asset ids to ((vehicle_type, status) before, after). Costs are
+    read in one query and the deltas summed per group, so the number of updates
+    depends on the groups involved, not the number of assets.
+    """
+    PurchaseDetails = fleet_model("PurchaseDetails")
+    costs = dict(
+        PurchaseDetails.objects.filter(asset_id__in=list(moves)).values_list("asset_id", "cost_price"))
+
+    deltas = defaultdict(lambda: [0, Decimal(0)])
+    for asset_id, (before, after) in moves.items():
+        cost = costs.get(asset_id) or 0
+        deltas[before][0] -= 1
+        deltas[before][1] -= cost
+        deltas[after][0] += 1
+        deltas[after][1] += cost
+
+    with transaction.atomic():
+        for (vehicle_type, status), (count, amount) in sorted(deltas.items()):
+            apply_delta("VehicleTypeRollup", {"vehicle_type": vehicle_type, "status": status}, count, amount)
+
+
+def purchase_saved(instance, previous):
+    cost = field_value(instance, "cost_price") or 0
+    with transaction.atomic():
+        if previous is not None:
+            old_group = asset_group(previous["asset_id"])
+            if old_group:
+                apply_delta("VehicleTypeRollup", old_group, 0, -(previous["cost_price"] or 0))
+        group = asset_group(instance.asset_id)
+        if group:
+            apply_delta("VehicleTypeRollup", group, 0, cost)
+
+
+def purchase_deleted(instance, group):
+    if group:
+        apply_delta("VehicleTypeRollup", group, 0, -(field_value(instance, "cost_price") or 0))
+
+
+def financing_saved(instance, previous):
+    with transaction.atomic():
+        if previous is not None:
+            apply_delta("FundingRollup", {"funding_institution": previous["funding_institution"]},
+                        -1, -(previous["installments"] or 0))
+        apply_delta("FundingRollup", {"funding_institution": instance.funding_institution},
+                    1, field_value(instance, "installments") or 0)
+
+
+def financing_deleted(instance):
+    apply_delta("FundingRollup", {"funding_institution": instance.funding_institution},
+                -1, -(field_value(instance, "installments") or 0))
+
+
+def licence_saved(instance, previous):
+    with transaction.atomic():
+        if previous is not None:
+            apply_delta("ExpiryMonthRollup", {"month": expiry_month(previous["disc_expiry_date"])},
+                        -1, -(previous["disc_fee"] or 0))
+        apply_delta("ExpiryMonthRollup", {"month": expiry_month(field_value(instance, "disc_expiry_date"))},
+                    1, field_value(instance, "disc_fee") or 0)
+
+
+def licence_deleted(instance):
+    apply_delta("ExpiryMonthRollup", {"month": expiry_month(field_value(instance, "disc_expiry_date"))},
+                -1, -(field_value(instance, "disc_fee") or 0))
+
+
+def live_rollups():
+    """Aggregates the rollup rows from the source tables: {rollup name: {key: (count, amount)}}."""
+    Asset = fleet_model("Asset")
+    FinancingDetails = fleet_model("FinancingDetails")
+    LicensingDetails = fleet_model("LicensingDetails")
+
+    vehicles = Asset.objects.values("vehicle_type", "status").annotate(
+        count=Count("id"), amount=Sum("purchasedetails__cost_price")).order_by()
+    funders = FinancingDetails.objects.values("funding_institution").annotate(
+        count=Count("id"), amount=Sum("installments")).order_by()
+    months = LicensingDetails.objects.values(month=ExtractMonth("disc_expiry_date")).annotate(
+        count=Count("id"), amount=Sum("disc_fee")).order_by()
+
+    def totals(row):
+        # SQLite sums decimals as floats; round to the rollup columns' 3 places
+        return row["count"], Decimal(row["amount"] or 0).quantize(AMOUNT_PLACES)
+
+    return {
+        "VehicleTypeRollup": {(row["vehicle_type"], row["status"]): totals(row) for row in vehicles},
+        "FundingRollup": {(row["funding_institution"],): totals(row) for row in funders},
+        "ExpiryMonthRollup": {(row["month"] or 0,): totals(row) for row in months},
+    }
+
+
+def stored_rollups():
+    """Reads the rollup tables in the same shape as live_rollups(), skipping emptied groups."""
+    stored = {}
+    for name, (key_fields, (count_field, amount_field)) in ROLLUP_FIELDS.items():
+        rows = fleet_model(name).objects.values_list(*key_fields, count_field, amount_field)
+        stored[name] = {
+            tuple(row[:-2]): (row[-2], row[-1]) for row in rows if row[-2] or row[-1]
+        }
+    return stored
+
+
+def rebuild_rollups():
+    """Replaces every rollup row with freshly aggregated values and drops the cached summaries and pages."""
+    live = live_rollups()
+    with transaction.atomic():
+        for name, (key_fields, (count_field, amount_field)) in ROLLUP_FIELDS.items():
+            model = fleet_model(name)
+            model.objects.all().delete()
+            model.objects.bulk_create([
+                model(**dict(zip(key_fields, key)), **{count_field: count, amount_field: amount})
+                for key, (count, amount) in live[name].items()
+            ])
+    invalidate_summaries()
+    bump_data_versions()
+    return {name: len(groups) for name, groups in live.items()}
+
+
+def rollup_differences():
+    """Returns (rollup name, key, stored, live) for every group where the tables disagree."""
+    live = live_rollups()
+    stored = stored_rollups()
+    differences = []
+    for name in ROLLUP_FIELDS:
+        for key in sorted(set(live[name]) | set(stored[name]), key=str):
+            if stored[name].get(key) != live[name].get(key):
+                differences.append((name, key, stored[name].get(key), live[name].get(key)))
+    return differences
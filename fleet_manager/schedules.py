@@ -0,0 +1,47 @@
+"""Recurring django_q schedules, registered once after migrate instead of on every import of tasks.py."""
+
+from datetime import datetime, time, timedelta
+
+from django.utils.timezone import localtime, make_aware, now
+
+# Schedule name -> (task path, schedule type, time of day of the first run)
+SCHEDULES = {
+    "vehicle-expiry-reminders": ("fleet_manager.tasks.send_vehicle_expiry_reminder", "D", time(6, 0)),
+    "purge-export-jobs": ("fleet_manager.tasks.purge_export_jobs", "D", time(3, 0)),
+}
+
+
+def first_run(at):
+    """Returns the next occurrence of the time of day ``at``."""
+    today = localtime(now()).date()
+    run = make_aware(datetime.combine(today, at))
+    return run if run > now() else run + timedelta(days=1)
+
+
+def register_schedules(apps=None, using="default", **kwargs):
+    """Creates or updates each schedule by name, removing other schedules of the same task."""
+    if apps is None:
+        from django.apps import apps
+    try:
+        Schedule = apps.get_model("django_q", "Schedule")
+    except LookupError:
+        # django_q's tables aren't migrated yet; the next migrate registers them
+        return
+    schedules = Schedule._default_manager.db_manager(using)
+
+    for name, (func, schedule_type, at) in SCHEDULES.items():
+        # Left behind by the import-time schedule() call this replaces
+        schedules.filter(func=func).exclude(name=name).delete()
+        schedule, created = schedules.get_or_create(
+            name=name,
+            defaults={
+                "func": func,
+                "schedule_type": schedule_type,
+                "repeats": -1,
+                "next_run": first_run(at),
+            },
+        )
+        if not created and (schedule.func, schedule.schedule_type) != (func, schedule_type):
+            schedule.func = func
+            schedule.schedule_type = schedule_type
+            schedule.save(update_fields=["func", "schedule_type"])
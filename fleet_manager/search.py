@@ -0,0 +1,106 @@
+"""Ranked asset search backed by the AssetSearchToken inverted index.
+
+Each asset is indexed as lowercase words from its make, model, VIN and licence
+numbers. A query matches assets having, for every query word, a token starting
+with that word; results are ranked by the summed weight of the matched tokens,
+with exact matches counting double.
+"""
+
+import re
+
+from django.db.models import Case, Count, F, IntegerField, Q, Sum, When
+
+from .models import Asset, AssetSearchToken, LicensingDetails
+
+# Field -> weight of its tokens when ranking results
+FIELD_WEIGHTS = {
+    "vin": 5,
+    "reg_no": 5,
+    "fleet_no": 4,
+    "make": 3,
+    "model": 2,
+}
+
+# Query words are capped so a pasted paragraph can't build a huge query
+MAX_QUERY_TERMS = 5
+
+WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(value):
+    """Returns the lowercase alphanumeric words of a value."""
+    return WORD_RE.findall((value or "").lower())[:20]
+
+
+def field_tokens(value):
+    """Returns a field's words, plus the words joined up for identifiers like 'AA11SM GP'."""
+    words = tokenize(value)
+    if len(words) > 1:
+        words.append("".join(words))
+    return words
+
+
+def asset_tokens(asset, licences):
+    """Returns {token: weight} for an asset and its licensing details."""
+    values = [(asset.make, "make"), (asset.model, "model"), (asset.vin, "vin")]
+    for licence in licences:
+        values.append((licence.reg_no, "reg_no"))
+        values.append((licence.fleet_no, "fleet_no"))
+
+    tokens = {}
+    for value, field in values:
+        for token in field_tokens(value):
+            token = token[:100]
+            tokens[token] = max(tokens.get(token, 0), FIELD_WEIGHTS[field])
+    return tokens
+
+
+def index_assets(asset_ids):
+    """Rebuilds the search tokens of the given assets in a bounded number of queries."""
+    asset_ids = list(asset_ids)
+    if not asset_ids:
+        return
+
+    licences = {}
+    for licence in LicensingDetails.objects.filter(asset_id__in=asset_ids).only(
+            "reg_no", "fleet_no", "asset_id"):
+        licences.setdefault(licence.asset_id, []).append(licence)
+
+    entries = []
+    for asset in Asset.objects.filter(id__in=asset_ids).only("make", "model", "vin"):
+        for token, weight in asset_tokens(asset, licences.get(asset.id, [])).items():
+            entries.append(AssetSearchToken(asset_id=asset.id, token=token, weight=weight))
+
+    AssetSearchToken.objects.filter(asset_id__in=asset_ids).delete()
+    AssetSearchToken.objects.bulk_create(entries, batch_size=1000)
+
+
+def search_assets(query):
+    """Returns a queryset of {'asset_id', 'score'} rows ranked by relevance for a search query."""
+    terms = list(dict.fromkeys(tokenize(query)))[:MAX_QUERY_TERMS]
+    if not terms:
+        return AssetSearchToken.objects.none().values("asset_id")
+
+    matches = Q()
+    for term in terms:
+        matches |= Q(token__startswith=term)
+
+    # Tokens matching each query word, counted separately because one token can
+    # match several words ('reg00' and 'reg001') and assets must match every word
+    term_matches = {
+        f"term_{i}_matches": Count("id", filter=Q(token__startswith=term))
+        for i, term in enumerate(terms)
+    }
+    score = Case(
+        When(token__in=terms, then=F("weight") * 2),
+        default=F("weight"),
+        output_field=IntegerField(),
+    )
+
+    return (
+        AssetSearchToken.objects.filter(matches)
+        .values("asset_id")
+        .annotate(score=Sum(score), **term_matches)
+        .filter(**{f"{name}__gt": 0 for name in term_matches})
+        .order_by("-score", "asset_id")
+    )
@@ -0,0 +1,29 @@
+"""Compact JSON representations of assets and their related records.
+
+Dates and decimals are left to DjangoJSONEncoder, which writes them as ISO
+dates and strings so costs keep their exact value.
+"""
+
+ASSET_FIELDS = ("id", "year", "make", "model", "vehicle_type", "sub_category", "classification", "status", "vin")
+PURCHASE_FIELDS = ("purchase_date", "dealership", "invoice_no", "cost_price")
+FINANCING_FIELDS = ("funding_institution", "loan_ref_number", "loan_end_date", "loan_terms", "installments")
+LICENSING_FIELDS = ("reg_no", "fleet_no", "disc_fee", "disc_expiry_date")
+
+# Separators without spaces, for JsonResponse's json_dumps_params
+COMPACT_JSON = {"separators": (",", ":")}
+
+
+def record_data(record, fields):
+    return {field: getattr(record, field) for field in fields}
+
+
+def asset_detail_data(asset):
+    """An asset with its purchase, financing and licensing records, as loaded by views.asset_detail_queryset()."""
+    purchase = getattr(asset, "purchasedetails", None)
+    return {
+        **record_data(asset, ASSET_FIELDS),
+        "updated_at": asset.updated_at,
+        "purchase": record_data(purchase, PURCHASE_FIELDS) if purchase else None,
+        "financing": [record_data(record, FINANCING_FIELDS) for record in asset.financingdetails_set.all()],
+        "licensing": [record_data(record, LICENSING_FIELDS) for record in asset.licensingdetails_set.all()],
+    }
@@ -0,0 +1,180 @@
+from django.db import transaction
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from django.utils.timezone import now
+from django_q.tasks import async_task
+
+from . import autocomplete, rollups
+from .models import Asset, PurchaseDetails, FinancingDetails, LicensingDetails, User
+from .page_cache import bump_data_versions
+from .search import index_assets
+from .summaries import invalidate_summaries
+
+
+def reindex_on_commit(asset_id):
+    # Deferred to commit so rolled-back writes never reach the index
+    transaction.on_commit(lambda: index_assets([asset_id]))
+
+
+def deleted_with_asset(origin):
+    origin_model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return origin_model is Asset
+
+
+# Asset fields that feed the search index (see search.asset_tokens)
+INDEXED_ASSET_FIELDS = {"vin", "make", "model"}
+
+
+@receiver(post_save, sender=Asset)
+def index_saved_asset(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and not INDEXED_ASSET_FIELDS.intersection(update_fields):
+        return
+    reindex_on_commit(instance.pk)
+
+
+@receiver(post_save, sender=LicensingDetails)
+@receiver(post_delete, sender=LicensingDetails)
+def index_licence_asset(sender, instance, origin=None, **kwargs):
+    # Licences deleted along with their asset take its tokens with them
+    if deleted_with_asset(origin):
+        return
+    reindex_on_commit(instance.asset_id)
+
+
+@receiver(post_save, sender=PurchaseDetails)
+@receiver(post_delete, sender=PurchaseDetails)
+@receiver(post_save, sender=FinancingDetails)
+@receiver(post_delete, sender=FinancingDetails)
+@receiver(post_save, sender=LicensingDetails)
+@receiver(post_delete, sender=LicensingDetails)
+def touch_asset(sender, instance, origin=None, raw=False, **kwargs):
+    # The asset detail view's ETag and Last-Modified come from Asset.updated_at
+    if raw or deleted_with_asset(origin):
+        return
+    Asset.objects.filter(pk=instance.asset_id).update(updated_at=now())
+
+
+@receiver(post_save, sender=Asset)
+@receiver(post_delete, sender=Asset)
+@receiver(post_save, sender=LicensingDetails)
+@receiver(post_delete, sender=LicensingDetails)
+def invalidate_autocomplete(sender, **kwargs):
+    # Other processes pick up the change when their copy expires
+    autocomplete.index.invalidate()
+
+
+# Fields whose saved values the rollup deltas subtract before adding the new ones
+ROLLUP_TRACKED_FIELDS = {
+    Asset: ("vehicle_type", "status"),
+    PurchaseDetails: ("asset_id", "cost_price"),
+    FinancingDetails: ("funding_institution", "installments"),
+    LicensingDetails: ("disc_expiry_date", "disc_fee"),
+}
+
+
+def skips_rollups(sender, raw, update_fields):
+    """True for fixture loads, deferred rollups and partial saves that don't touch a tracked field."""
+    if raw or rollups.is_deferred():
+        return True
+    if update_fields is None:
+        return False
+    tracked = ROLLUP_TRACKED_FIELDS[sender]
+    return not set(update_fields).intersection(tracked + tuple(name.removesuffix("_id") for name in tracked))
+
+
+@receiver(pre_save, sender=Asset)
+@receiver(pre_save, sender=PurchaseDetails)
+@receiver(pre_save, sender=FinancingDetails)
+@receiver(pre_save, sender=LicensingDetails)
+def remember_rollup_values(sender, instance, raw=False, update_fields=None, **kwargs):
+    if skips_rollups(sender, raw, update_fields):
+        return
+    instance._rollup_previous = rollups.stored_values(instance, *ROLLUP_TRACKED_FIELDS[sender])
+
+
+@receiver(post_save, sender=Asset)
+def update_vehicle_rollup(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    if not skips_rollups(sender, raw, update_fields):
+        rollups.asset_saved(instance, instance.__dict__.pop("_rollup_previous", None), created)
+
+
+@receiver(post_save, sender=PurchaseDetails)
+def update_cost_rollup(sender, instance, raw=False, update_fields=None, **kwargs):
+    if not skips_rollups(sender, raw, update_fields):
+        rollups.purchase_saved(instance, instance.__dict__.pop("_rollup_previous", None))
+
+
+@receiver(post_save, sender=FinancingDetails)
+def update_funding_rollup(sender, instance, raw=False, update_fields=None, **kwargs):
+    if not skips_rollups(sender, raw, update_fields):
+        rollups.financing_saved(instance, instance.__dict__.pop("_rollup_previous", None))
+
+
+@receiver(post_save, sender=LicensingDetails)
+def update_expiry_rollup(sender, instance, raw=False, update_fields=None, **kwargs):
+    if not skips_rollups(sender, raw, update_fields):
+        rollups.licence_saved(instance, instance.__dict__.pop("_rollup_previous", None))
+
+
+@receiver(pre_delete, sender=PurchaseDetails)
+def remember_purchase_group(sender, instance, **kwargs):
+    # Read before a cascading delete removes the asset
+    if not rollups.is_deferred():
+        instance._rollup_group = rollups.asset_group(instance.asset_id)
+
+
+@receiver(post_delete, sender=Asset)
+@receiver(post_delete, sender=PurchaseDetails)
+@receiver(post_delete, sender=FinancingDetails)
+@receiver(post_delete, sender=LicensingDetails)
+def remove_from_rollups(sender, instance, **kwargs):
+    if rollups.is_deferred():
+        return
+    if sender is Asset:
+        rollups.asset_deleted(instance)
+    elif sender is PurchaseDetails:
+        rollups.purchase_deleted(instance, instance.__dict__.pop("_rollup_group", None))
+    elif sender is FinancingDetails:
+        rollups.financing_deleted(instance)
+    else:
+        rollups.licence_deleted(instance)
+
+
+@receiver(post_save, sender=Asset)
+@receiver(post_delete, sender=Asset)
+@receiver(post_save, sender=PurchaseDetails)
+@receiver(post_delete, sender=PurchaseDetails)
+@receiver(post_save, sender=FinancingDetails)
+@receiver(post_delete, sender=FinancingDetails)
+@receiver(post_save, sender=LicensingDetails)
+@receiver(post_delete, sender=LicensingDetails)
+def invalidate_dashboard_summaries(sender, **kwargs):
+    # Connected after the rollup receivers so the next read sees the updated rollups
+    invalidate_summaries(sender.__name__)
+    bump_data_versions(sender.__name__)
+
+
+@receiver(pre_save, sender=User)
+def remember_profile_picture(sender, instance, raw=False, update_fields=None, **kwargs):
+    instance._picture_changed = False
+    if raw or (update_fields is not None and "profile_picture" not in update_fields):
+        return
+    previous = None
+    if instance.pk is not None:
+        previous = User.objects.filter(pk=instance.pk).values_list("profile_picture", flat=True).first()
+    instance._picture_changed = (previous or "") != (instance.profile_picture.name or "")
+
+
+@receiver(post_save, sender=User)
+def queue_avatar_thumbnails(sender, instance, **kwargs):
+    if not getattr(instance, "_picture_changed", False):
+        return
+    instance._picture_changed = False
+    if instance.avatar_thumbnails:
+        # The old picture's thumbnails stop showing; the original is shown until the new ones are made
+        instance.avatar_thumbnails = {}
+        User.objects.filter(pk=instance.pk).update(avatar_thumbnails={})
+    if instance.has_uploaded_picture:
+        user_id = instance.pk
+        transaction.on_commit(lambda: async_task("fleet_manager.tasks.make_avatar_thumbnails", user_id))
@@ -78,3 +78,32 @@ if (window.innerWidth < 768) {
 } else {
     sidebar.classList.remove("close");
 }
+
+// Suggest VINs, registration and fleet numbers while typing in the navbar search
+const searchInput = document.querySelector(".search_bar input[name='q']");
+const searchSuggestions = document.querySelector("#search-suggestions");
+let suggestionTimer;
+
+if (searchInput && searchSuggestions) {
+    searchInput.addEventListener("input", () => {
+        clearTimeout(suggestionTimer);
+        const query = searchInput.value.trim();
+        if (query.length < 2) {
+            searchSuggestions.innerHTML = "";
+            return;
+        }
+        suggestionTimer = setTimeout(() => {
+            const url = `${searchInput.dataset.autocompleteUrl}?q=${encodeURIComponent(query)}`;
+            fetch(url)
+                .then(response => response.json())
+                .then(data => {
+                    searchSuggestions.innerHTML = "";
+                    data.results.forEach(result => {
+                        const option = document.createElement("option");
+                        option.value = result.value;
+                        searchSuggestions.appendChild(option);
+                    });
+                });
+        }, 150);
+    });
+}
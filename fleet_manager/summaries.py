@@ -0,0 +1,151 @@
+"""Fleet-wide dashboard aggregates, cached until the underlying models change.
+
+Each summary is read from its rollup table (see rollups.py) on a cache miss,
+one row per group, and stored in Django's cache. Signal handlers in signals.py
+delete the affected entries when Asset, PurchaseDetails, FinancingDetails or
+LicensingDetails rows are saved or deleted; bulk writers (import_assets, the
+benchmark seeder) rebuild the rollups, which invalidates every summary, because
+bulk queries don't send signals.
+
+With the default local-memory cache each process holds its own copy, so other
+processes only see a change when SUMMARY_CACHE_SECONDS runs out. Use the file
+or database cache backend (CACHE_BACKEND) to share invalidations between processes.
+
+The a*-prefixed functions are the async equivalents for the async views, using
+the async ORM and cache APIs.
+"""
+
+from datetime import datetime
+
+from django.core.cache import cache
+from django.db.models import F
+
+from .models import VehicleTypeRollup, FundingRollup, ExpiryMonthRollup
+
+SUMMARY_CACHE_SECONDS = 300
+
+VEHICLE_SUMMARY_KEY = "fleet_summary:vehicles"
+FINANCE_SUMMARY_KEY = "fleet_summary:finance"
+EXPIRY_SUMMARY_KEY = "fleet_summary:expiry_months"
+
+# Model -> cache keys of the summaries computed from it
+SUMMARY_KEYS_BY_MODEL = {
+    "Asset": [VEHICLE_SUMMARY_KEY],
+    "PurchaseDetails": [VEHICLE_SUMMARY_KEY],
+    "FinancingDetails": [FINANCE_SUMMARY_KEY],
+    "LicensingDetails": [EXPIRY_SUMMARY_KEY],
+}
+
+
+def vehicle_rows():
+    return (
+        VehicleTypeRollup.objects.filter(status='Active', asset_count__gt=0)
+        .values('vehicle_type', 'total_cost', count=F('asset_count'))
+        .order_by('vehicle_type')
+    )
+
+
+def vehicle_totals(vehicle_summary):
+    return {
+        'vehicle_summary': vehicle_summary,
+        'total_count': sum(item['count'] for item in vehicle_summary),
+        'total_cost': sum(item['total_cost'] for item in vehicle_summary if item['total_cost'] is not None),
+    }
+
+
+def finance_rows():
+    return (
+        FundingRollup.objects.filter(financed_count__gt=0)
+        .values('funding_institution', 'total_installments', count=F('financed_count'))
+        .order_by('funding_institution')
+    )
+
+
+def expiry_rows():
+    return (
+        ExpiryMonthRollup.objects.filter(disc_count__gt=0)
+        .values('month', 'total_fees', num_vehicles=F('disc_count'))
+        .order_by('month')
+    )
+
+
+def expiry_months(monthly_expiries):
+    # Convert month number to name (e.g., 1 → January)
+    month_map = {i: datetime(2000, i, 1).strftime('%B') for i in range(1, 13)}
+    return [
+        {
+            "month": month_map.get(item["month"], "Unknown"),
+            "num_vehicles": item["num_vehicles"],
+            "total_fees": item["total_fees"] or 0  # Ensure no None values
+        }
+        for item in monthly_expiries
+    ]
+
+
+def compute_vehicle_summary():
+    """Count and total cost of active assets per vehicle type, with overall totals."""
+    return vehicle_totals(list(vehicle_rows()))
+
+
+def compute_finance_summary():
+    """Number of financed assets and total installments per funding institution."""
+    return list(finance_rows())
+
+
+def compute_expiry_summary():
+    """Number of discs and total renewal fees per expiry month."""
+    return expiry_months(expiry_rows())
+
+
+async def acompute_vehicle_summary():
+    return vehicle_totals([row async for row in vehicle_rows()])
+
+
+async def acompute_finance_summary():
+    return [row async for row in finance_rows()]
+
+
+async def acompute_expiry_summary():
+    return expiry_months([row async for row in expiry_rows()])
+
+
+def vehicle_summary():
+    return cache.get_or_set(VEHICLE_SUMMARY_KEY, compute_vehicle_summary, SUMMARY_CACHE_SECONDS)
+
+
+def finance_summary():
+    return cache.get_or_set(FINANCE_SUMMARY_KEY, compute_finance_summary, SUMMARY_CACHE_SECONDS)
+
+
+def expiry_summary():
+    return cache.get_or_set(EXPIRY_SUMMARY_KEY, compute_expiry_summary, SUMMARY_CACHE_SECONDS)
+
+
+async def acached(key, acompute):
+    """Async cache.get_or_set() for a coroutine function."""
+    value = await cache.aget(key)
+    if value is None:
+        value = await acompute()
+        await cache.aset(key, value, SUMMARY_CACHE_SECONDS)
+    return value
+
+
+async def avehicle_summary():
+    return await acached(VEHICLE_SUMMARY_KEY, acompute_vehicle_summary)
+
+
+async def afinance_summary():
+    return await acached(FINANCE_SUMMARY_KEY, acompute_finance_summary)
+
+
+async def aexpiry_summary():
+    return await acached(EXPIRY_SUMMARY_KEY, acompute_expiry_summary)
+
+
+def invalidate_summaries(*model_names):
+    """Drops the cached summaries built from the given models, or all of them."""
+    if model_names:
+        keys = {key for name in model_names for key in SUMMARY_KEYS_BY_MODEL.get(name, [])}
+    else:
+        keys = {key for keys in SUMMARY_KEYS_BY_MODEL.values() for key in keys}
+    cache.delete_many(list(keys))
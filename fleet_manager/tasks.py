@@ -1,45 +1,199 @@
-from django.utils.timezone import now
-from django_q.tasks import schedule
-from django.core.mail import send_mail
-from fleet_manager.models import Asset, LicensingDetails
+import shutil
+import time
+from pathlib import Path
+from django.conf import settings
+from django.db.models import Exists, OuterRef
+from django.utils.timezone import localdate, now
+from django_q.tasks import async_task, fetch_group
+from fleet_manager.avatars import make_thumbnails
+from fleet_manager.exports import EXPORT_FORMATS, EXPORT_JOB_RETENTION_DAYS, assets_for_export, export_chunks
+from fleet_manager.models import Asset, ExportJob, ExpiryReminder, LicensingDetails, User
+from fleet_manager.reminders import build_digests, send_digests
 from datetime import timedelta
 
 
+# Share of the Q_CLUSTER timeout a reminder task spends sending before handing over
+REMINDER_TIME_BUDGET = 0.75
+
+# Days before a disc expires that its reminder is sent
+REMINDER_WINDOW_DAYS = 30
+
+# Licences per reminder task; each qcluster worker sends one chunk at a time
+REMINDER_CHUNK_SIZE = 500
+
+# Times a chunk is run, whether it failed or ran out of time, before it's left for the next day's run
+REMINDER_CHUNK_ATTEMPTS = 3
+
+# Task group of a day's reminder chunks, followed by the date
+REMINDER_GROUP_PREFIX = "expiry-reminders-"
+
+
+def reminders_due(today):
+    """Licences whose disc expires in the next 30 days and that haven't been reminded for that expiry date.
+
+    An indexed range on disc_expiry_date, minus the ledger entries for the same
+    window; expired discs and already-reminded ones are never re-read.
+    """
+    already_sent = ExpiryReminder.objects.filter(
+        licence=OuterRef("pk"), disc_expiry_date=OuterRef("disc_expiry_date"))
+    return LicensingDetails.objects.filter(
+        disc_expiry_date__gte=today,
+        disc_expiry_date__lte=today + timedelta(days=REMINDER_WINDOW_DAYS),
+    ).exclude(Exists(already_sent))
+
+
+def record_reminders(digests):
+    ExpiryReminder.objects.bulk_create(
+        [ExpiryReminder(licence_id=licence.pk, disc_expiry_date=licence.disc_expiry_date)
+         for digest in digests for licence in digest.licences],
+        ignore_conflicts=True,
+    )
+
+
+def reminder_chunks(due, chunk_size):
+    """Splits the due licences into (first_id, last_id) ranges of up to ``chunk_size`` licences."""
+    ids = list(due.order_by("id").values_list("id", flat=True))
+    return [
+        (ids[start], ids[min(start + chunk_size, len(ids)) - 1])
+        for start in range(0, len(ids), chunk_size)
+    ]
+
+
 def send_vehicle_expiry_reminder():
-    # Get assets with licensing details expiring in 30 days
-    expiring_licenses = LicensingDetails.objects.filter(
-        disc_expiry_date__isnull=False,
-        disc_expiry_date__lte=now() + timedelta(days=30),
-    ).select_related("asset")  # Preload asset data to optimize queries
-
-    for license_detail in expiring_licenses:
-        asset = license_detail.asset  # Get related asset
-        expiry_date = license_detail.disc_expiry_date.strftime("%Y-%m-%d")  # Format date
-
-        send_mail(
-            subject=f"Vehicle Expiry Reminder - {asset.vin}",
-            message=(f"""
-            Vehicle Expiry Reminder
-
-            Your vehicle {asset.make} {asset.model} (VIN: {asset.vin})  
-            has a license disc expiring on {expiry_date}.  
-
-            Please ensure it is renewed before the deadline.
-
-            Regards,  
-            Fleet Management Team
-            """
-            ),
-            from_email="admin@lingode.co.za",
-            recipient_list=["info@lingode.co.za"],
-            fail_silently=False,
-        )
-
-
-# Schedule the function to run daily
-schedule(
-    "fleet_manager.tasks.send_vehicle_expiry_reminder",
-    schedule_type="D",  # Run Daily
-    repeats=-1,  # Repeat indefinitely
-    next_run=now().replace(hour=6, minute=0, second=0, microsecond=0)  # Run daily at 6 AM
-)
\ No newline at end of file
+    """Coordinator: enqueues one django_q task per id range of licences newly due a reminder.
+
+    The chunks run in parallel on the qcluster workers as one task group; see
+    reminder_group_results() for their outcome.
+    """
+    today = localdate()
+
+    # Ledger entries for discs that have expired can no longer match
+    ExpiryReminder.objects.filter(disc_expiry_date__lt=today).delete()
+
+    group = f"{REMINDER_GROUP_PREFIX}{today.isoformat()}"
+    chunks = reminder_chunks(reminders_due(today), REMINDER_CHUNK_SIZE)
+    for first_id, last_id in chunks:
+        enqueue_reminder_chunk(group, first_id, last_id)
+    return {"group": group, "chunks": len(chunks)}
+
+
+def enqueue_reminder_chunk(group, first_id, last_id, attempt=1):
+    async_task(
+        "fleet_manager.tasks.send_reminder_chunk", first_id, last_id, attempt,
+        group=group, hook="fleet_manager.tasks.reminder_chunk_done",
+    )
+
+
+def send_reminder_chunk(first_id, last_id, attempt=1):
+    """Emails the digests for the due licences with ids in [first_id, last_id].
+
+    Stops before the task timeout; the licences left over are still due (the
+    ledger only records sent ones), so the hook re-runs the same range.
+    """
+    deadline = time.monotonic() + settings.Q_CLUSTER["timeout"] * REMINDER_TIME_BUDGET
+    due = reminders_due(localdate()).filter(id__range=(first_id, last_id)).select_related("asset").only(
+        "reg_no", "fleet_no", "disc_expiry_date",
+        "asset__make", "asset__model", "asset__vin",
+    )
+
+    digests = build_digests(due)
+    unsent = send_digests(digests, deadline, time.monotonic, on_sent=record_reminders)
+    sent = digests[:len(digests) - len(unsent)]
+    return {
+        "sent": len(sent),
+        "licences": sum(len(digest.licences) for digest in sent),
+        "remaining": len(unsent),
+    }
+
+
+def reminder_chunk_done(task):
+    """Result hook: re-enqueues a chunk that failed or ran out of time, up to REMINDER_CHUNK_ATTEMPTS runs."""
+    first_id, last_id, attempt = task.args
+    unfinished = not task.success or task.result["remaining"]
+    if unfinished and attempt < REMINDER_CHUNK_ATTEMPTS:
+        enqueue_reminder_chunk(task.group, first_id, last_id, attempt + 1)
+
+
+def reminder_group_results(group):
+    """Totals the chunk results of a reminder run, listing the ranges whose last attempt failed or ran out of time."""
+    totals = {"sent": 0, "licences": 0, "failed": []}
+    for task in fetch_group(group, failures=True) or []:
+        last_attempt = task.args[2] >= REMINDER_CHUNK_ATTEMPTS
+        if task.success:
+            totals["sent"] += task.result["sent"]
+            totals["licences"] += task.result["licences"]
+            if last_attempt and task.result["remaining"]:
+                totals["failed"].append(
+                    (task.args[0], task.args[1], f"{task.result['remaining']} digests left unsent"))
+        elif last_attempt:
+            totals["failed"].append((task.args[0], task.args[1], task.result))
+    return totals
+
+
+def track_progress(job, chunks):
+    """Passes export chunks through, recording the rows written on the job after each one."""
+    for rows in chunks:
+        yield rows
+        job.rows_written += len(rows)
+        ExportJob.objects.filter(pk=job.pk).update(rows_written=job.rows_written)
+
+
+def run_export_job(job_id):
+    """Writes an ExportJob's file to MEDIA_ROOT chunk by chunk."""
+    job = ExportJob.objects.get(pk=job_id)
+    assets, filename = assets_for_export(job.vehicle_type)
+    columns = job.columns.split(",")
+    writer, _, extension = EXPORT_FORMATS[job.export_format]
+
+    job.status = "Running"
+    job.total_rows = assets.count()
+    job.save(update_fields=["status", "total_rows"])
+
+    relative_path = f"exports/{job.pk}/{filename}.{extension}"
+    path = Path(settings.MEDIA_ROOT) / relative_path
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    try:
+        with open(path, "wb") as f:
+            for data in writer(columns, track_progress(job, export_chunks(assets, columns))):
+                f.write(data.encode() if isinstance(data, str) else data)
+    except Exception as e:
+        job.status = "Failed"
+        job.error = str(e)
+        job.finished_at = now()
+        job.save(update_fields=["status", "error", "finished_at"])
+        raise
+
+    job.file.name = relative_path
+    job.status = "Done"
+    job.finished_at = now()
+    job.save(update_fields=["file", "status", "rows_written", "finished_at"])
+
+
+def export_job_done(task):
+    """Result hook: marks the job Failed when its task failed without doing so, e.g. on hitting the timeout."""
+    if not task.success:
+        # django_q's timeout raises SystemExit, which run_export_job's except doesn't catch
+        ExportJob.objects.filter(pk=task.args[0]).exclude(status="Failed").update(
+            status="Failed", error=str(task.result).split(" : ", 1)[0], finished_at=now())
+
+
+def purge_export_jobs():
+    """Deletes export jobs created more than EXPORT_JOB_RETENTION_DAYS ago, with their files."""
+    expired = ExportJob.objects.filter(created_at__lt=now() - timedelta(days=EXPORT_JOB_RETENTION_DAYS))
+    job_ids = list(expired.values_list("pk", flat=True))
+    for job_id in job_ids:
+        shutil.rmtree(Path(settings.MEDIA_ROOT) / f"exports/{job_id}", ignore_errors=True)
+    ExportJob.objects.filter(pk__in=job_ids).delete()
+    return len(job_ids)
+
+
+def make_avatar_thumbnails(user_id):
+    """Writes a user's avatar thumbnails and records them, unless the picture was replaced in the meantime."""
+    user = User.objects.filter(pk=user_id).only("profile_picture").first()
+    if user is None or not user.has_uploaded_picture:
+        return {}
+    thumbnails = make_thumbnails(user.profile_picture)
+    # A newer picture has its own task queued
+    User.objects.filter(pk=user_id, profile_picture=user.profile_picture.name).update(avatar_thumbnails=thumbnails)
+    return thumbnails
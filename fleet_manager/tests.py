@@ -1,3 +1,1036 @@
-from django.test import TestCase
+import csv
+import os
+import shutil
+import tempfile
+import zipfile
+from collections import Counter
+from datetime import date, timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
+from types import SimpleNamespace
+from unittest import mock, skipIf
+from xml.etree import ElementTree
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.contrib import messages
+from django.core import mail, signing
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command, CommandError
+from django.core.paginator import Paginator
+from django.db import connection
+from django.db.models import Sum
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from PIL import Image
+
+from . import autocomplete
+from .benchmark import (
+    SEED_USERNAME, SIGNED_IN_VIEW_BENCHMARKS, benchmark_requests, clear_seeded_reminders, count_queries,
+    export_job_query_budget, fetch, reminder_query_budget, remove_seeded_fleet, run_export_benchmark,
+    run_reminder_benchmark, seed_fleet,
+)
+from .bulk import BulkEditError, bulk_edit_assets
+from .exports import pyarrow
+from .management.commands.import_assets import (
+    DEFAULT_CSV_PATH, Command as ImportAssetsCommand, read_lines, shard_csv,
+)
+from .models import (
+    Asset, PurchaseDetails, FinancingDetails, LicensingDetails, User, VehicleTypeRollup, ExportJob,
+    ExpiryReminder,
+)
+from .page_cache import CSRF_PLACEHOLDER, bump_data_versions, data_version
+from .pagination import keyset_paginate, make_cursor, read_cursor
+from .profiling import ProfilingMiddleware
+from .reminders import build_digests
+from .rollups import rollup_differences
+from .schedules import register_schedules
+from .search import search_assets
+from .tasks import (
+    export_job_done, purge_export_jobs, reminder_chunk_done, reminders_due, send_reminder_chunk,
+    send_vehicle_expiry_reminder,
+)
+
+
+def run_tasks_inline(target):
+    """Patches the async_task at ``target`` to run each task at once; the returned mock records the calls."""
+    def run_inline(func, *args, **options):
+        import_string(func)(*args)
+
+    return mock.patch(target, side_effect=run_inline)
+
+
+class TempMediaRootMixin:
+    """Points MEDIA_ROOT at a temporary directory that is removed after each test."""
+
+    def setUp(self):
+        super().setUp()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+
+def import_fleet():
+    """Imports the bundled initial_fleet.csv: 16 assets, 15 of them active."""
+    call_command('import_assets', stdout=StringIO(), stderr=StringIO())
+
+
+def fleet_csv(rows):
+    """Writes ``rows`` under the bundled CSV's header to a temporary file and returns its path."""
+    with open(DEFAULT_CSV_PATH, newline='', encoding='utf-8-sig') as f:
+        fieldnames = next(csv.reader(f))
+    path = tempfile.mkstemp(suffix='.csv')[1]
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames)
+        writer.writeheader()
+        writer.writerows(rows)
+    return path
+
+
+class ImportAssetsCommandTests(TestCase):
+    def setUp(self):
+        with open(DEFAULT_CSV_PATH, newline='', encoding='utf-8-sig') as f:
+            self.rows = list(csv.DictReader(f))
+
+    def import_assets(self, path=DEFAULT_CSV_PATH, **options):
+        stdout, stderr = StringIO(), StringIO()
+        call_command('import_assets', path=path, stdout=stdout, stderr=stderr, **options)
+        return stdout.getvalue(), stderr.getvalue()
+
+    def test_imports_every_row_in_batches(self):
+        output, _ = self.import_assets(batch_size=5)
+
+        self.assertIn(f'{len(self.rows)} created', output)
+        self.assertEqual(Asset.objects.count(), len(self.rows))
+        self.assertEqual(PurchaseDetails.objects.count(), len(self.rows))
+        self.assertEqual(LicensingDetails.objects.count(), sum(1 for row in self.rows if row['reg_no']))
+        self.assertEqual(
+            FinancingDetails.objects.count(), sum(1 for row in self.rows if row['funding_institution']))
+        asset = Asset.objects.get(vin=self.rows[0]['vin'])
+        self.assertEqual(str(asset.purchasedetails.purchase_date), self.rows[0]['purchase_date'].replace('/', '-'))
+        self.assertEqual(asset.licensingdetails_set.get().reg_no, self.rows[0]['reg_no'])
+        # bulk_create skips the signals, so the import indexes the assets itself
+        self.assertTrue(asset.search_tokens.exists())
+        self.assertEqual(VehicleTypeRollup.objects.aggregate(total=Sum('asset_count'))['total'], len(self.rows))
+
+    def test_a_bad_row_only_rejects_itself(self):
+        bad = {**self.rows[1], 'vin': 'BADROW0001'}  # Reuses another row's reg_no
+        path = fleet_csv(self.rows[:4] + [bad])
+        self.addCleanup(os.remove, path)
+
+        output, errors = self.import_assets(path=path, batch_size=5)
+
+        self.assertIn('4 created', output)
+        self.assertIn('1 failed', output)
+        self.assertIn('BADROW0001', errors)
+        self.assertEqual(len(errors.splitlines()), 1)
+        self.assertEqual(Asset.objects.count(), 4)
+        self.assertFalse(Asset.objects.filter(vin='BADROW0001').exists())
+
+    def test_reimporting_with_upsert_updates_only_changed_rows(self):
+        self.import_assets()
+        changed = {**self.rows[0], 'status': 'Sold', 'cost_price': '1'}
+        path = fleet_csv([changed] + self.rows[1:])
+        self.addCleanup(os.remove, path)
+
+        output, _ = self.import_assets(path=path, upsert=True)
+
+        self.assertIn(f'0 created, 1 updated, {len(self.rows) - 1} unchanged', output)
+        self.assertEqual(Asset.objects.count(), len(self.rows))
+        asset = Asset.objects.get(vin=changed['vin'])
+        self.assertEqual(asset.status, 'Sold')
+        self.assertEqual(asset.purchasedetails.cost_price, 1)
+
+    def test_reimporting_without_upsert_skips_duplicates(self):
+        self.import_assets()
+
+        output, errors = self.import_assets()
+
+        self.assertIn(f'0 created, 0 updated, 0 unchanged, {len(self.rows)} duplicate, 0 failed', output)
+        self.assertEqual(errors, '')
+        self.assertEqual(Asset.objects.count(), len(self.rows))
+
+    def import_shards(self, path, workers, upsert=False):
+        """Imports each byte-range shard in turn, the way the --workers processes would."""
+        fieldnames, shards = shard_csv(path, workers)
+        command = ImportAssetsCommand(stdout=StringIO(), stderr=StringIO())
+        totals = Counter()
+        for start, end in shards:
+            with open(path, 'rb') as f:
+                f.seek(start)
+                totals += command.import_rows(csv.DictReader(read_lines(f, end), fieldnames=fieldnames), 5, upsert)
+        return shards, totals
+
+    def test_shards_split_the_file_on_line_boundaries(self):
+        fieldnames, shards = shard_csv(DEFAULT_CSV_PATH, 4)
+
+        self.assertEqual(len(shards), 4)
+        self.assertEqual(shards[-1][1], os.path.getsize(DEFAULT_CSV_PATH))
+        self.assertTrue(all(end == next_start for (_, end), (next_start, _) in zip(shards, shards[1:])))
+        vins = []
+        with open(DEFAULT_CSV_PATH, 'rb') as f:
+            for start, end in shards:
+                f.seek(start)
+                vins += [row['vin'] for row in csv.DictReader(read_lines(f, end), fieldnames=fieldnames)]
+        self.assertEqual(vins, [row['vin'] for row in self.rows])
+
+    def test_vin_repeated_across_shards_is_a_duplicate(self):
+        path = fleet_csv(self.rows + [{**self.rows[0], 'reg_no': 'DUP001 GP'}])
+        self.addCleanup(os.remove, path)
+
+        shards, totals = self.import_shards(path, 3)
+
+        self.assertEqual(len(shards), 3)
+        self.assertEqual(totals['created'], len(self.rows))
+        self.assertEqual(totals['duplicate'], 1)
+        self.assertEqual(totals['failed'], 0)
+        self.assertFalse(LicensingDetails.objects.filter(reg_no='DUP001 GP').exists())
+
+    def test_vin_repeated_across_shards_is_updated_with_upsert(self):
+        path = fleet_csv(self.rows + [{**self.rows[0], 'status': 'Sold'}])
+        self.addCleanup(os.remove, path)
+
+        _, totals = self.import_shards(path, 3, upsert=True)
+
+        self.assertEqual((totals['created'], totals['updated']), (len(self.rows), 1))
+        self.assertEqual(Asset.objects.get(vin=self.rows[0]['vin']).status, 'Sold')
+
+    def test_workers_need_a_file(self):
+        with self.assertRaises(CommandError):
+            call_command('import_assets', path='-', workers=2, stdout=StringIO())
+
+
+def xlsx_rows(data):
+    """Reads the cell values of an exported workbook's only sheet."""
+    namespace = {'s': 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'}
+    with zipfile.ZipFile(BytesIO(data)) as archive:
+        sheet = ElementTree.fromstring(archive.read('xl/worksheets/sheet1.xml'))
+    return [
+        [''.join(cell.itertext()) for cell in row.findall('s:c', namespace)]
+        for row in sheet.iterfind('s:sheetData/s:row', namespace)
+    ]
+
+
+class AssetExportTests(TempMediaRootMixin, TestCase):
+    columns = 'vin,cost_price,reg_no,purchase_date'
+
+    def setUp(self):
+        super().setUp()
+        import_fleet()
+        self.expected = [
+            [vin, cost_price, reg_no, purchase_date]
+            for vin, cost_price, reg_no, purchase_date in Asset.objects.filter(status='Active').order_by('id')
+            .values_list('vin', 'purchasedetails__cost_price', 'licensingdetails__reg_no',
+                         'purchasedetails__purchase_date')
+        ]
+
+    def export(self, export_format):
+        response = self.client.get(reverse('export_assets'), {'format': export_format, 'columns': self.columns})
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content)
+
+    def parse(self, rows):
+        return [[vin, Decimal(cost_price), reg_no, date.fromisoformat(purchase_date)]
+                for vin, cost_price, reg_no, purchase_date in rows]
+
+    def test_csv_round_trip(self):
+        rows = list(csv.reader(StringIO(self.export('csv').decode())))
+
+        self.assertEqual(rows[0], ['VIN', 'Cost Price', 'Reg No', 'Purchase Date'])
+        self.assertEqual(self.parse(rows[1:]), self.expected)
+
+    def test_xlsx_round_trip(self):
+        rows = xlsx_rows(self.export('xlsx'))
+
+        self.assertEqual(rows[0], ['VIN', 'Cost Price', 'Reg No', 'Purchase Date'])
+        self.assertEqual(self.parse(rows[1:]), self.expected)
+
+    @skipIf(pyarrow is None, 'pyarrow is not installed')
+    def test_parquet_round_trip(self):
+        table = pyarrow.parquet.read_table(BytesIO(self.export('parquet')))
+
+        self.assertEqual(table.column_names, self.columns.split(','))
+        self.assertEqual([list(row.values()) for row in table.to_pylist()], self.expected)
+
+    def test_unknown_format_is_rejected(self):
+        response = self.client.get(reverse('export_assets'), {'format': 'pdf'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_background_export_job(self):
+        owner = User.objects.create_user('owner', 'owner@example.com', 'pw')
+        self.client.force_login(owner)
+        with run_tasks_inline('fleet_manager.views.async_task'):
+            response = self.client.post(reverse('create_export_job'), {'format': 'csv', 'columns': self.columns})
+            job = ExportJob.objects.get()
+            self.assertEqual(job.created_by, owner)
+            self.assertRedirects(response, reverse('export_job', args=[job.pk]))
+
+            status = self.client.get(reverse('export_job_status', args=[job.pk])).json()
+            self.assertEqual(status['status'], 'Done')
+            self.assertEqual(status['rows_written'], len(self.expected))
+            self.assertEqual(status['total_rows'], len(self.expected))
+
+            download = self.client.get(status['download_url'])
+            self.assertEqual(b''.join(download.streaming_content), self.export('csv'))
+
+            self.client.force_login(User.objects.create_user('other', 'other@example.com', 'pw'))
+            for name in ('export_job', 'export_job_status', 'export_job_download'):
+                with self.subTest(view=name):
+                    self.assertEqual(self.client.get(reverse(name, args=[job.pk])).status_code, 404)
+
+    def test_export_jobs_need_a_signed_in_user(self):
+        response = self.client.post(reverse('create_export_job'), {'format': 'csv', 'columns': self.columns})
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(ExportJob.objects.exists())
+
+    def test_timed_out_export_job_is_marked_failed(self):
+        job = ExportJob.objects.create(columns=self.columns, status='Running')
+        export_job_done(SimpleNamespace(
+            args=[str(job.pk)], success=False,
+            result='Task exceeded maximum timeout value (600 seconds) : Traceback ...'))
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'Failed')
+        self.assertEqual(job.error, 'Task exceeded maximum timeout value (600 seconds)')
+        self.assertIsNotNone(job.finished_at)
+
+    def test_old_export_jobs_are_purged_with_their_files(self):
+        old, recent = (ExportJob.objects.create(columns=self.columns, status='Done') for _ in range(2))
+        ExportJob.objects.filter(pk=old.pk).update(created_at=timezone.now() - timedelta(days=8))
+        for job in (old, recent):
+            os.makedirs(os.path.join(self.media_root, 'exports', str(job.pk)))
+
+        self.assertEqual(purge_export_jobs(), 1)
+        self.assertEqual(list(ExportJob.objects.all()), [recent])
+        self.assertEqual(os.listdir(os.path.join(self.media_root, 'exports')), [str(recent.pk)])
+
+
+class SearchAssetsTests(TestCase):
+    def setUp(self):
+        import_fleet()
+
+    def matches(self, query):
+        return [row['asset_id'] for row in search_assets(query)]
+
+    def test_assets_must_match_every_word(self):
+        self.assertEqual(len(self.matches('aa1')), 3)
+        self.assertEqual(len(self.matches('aa1 afrit')), 2)
+        self.assertEqual(self.matches('aa1 nosuchword'), [])
+
+    def test_one_token_can_match_several_words(self):
+        licence = LicensingDetails.objects.get(reg_no='AA11SM GP')
+        # 'aa11sm' starts with both words
+        self.assertEqual(self.matches('aa1 aa11'), [licence.asset_id])
+
+    def test_cascade_deletes_do_not_reindex(self):
+        asset = LicensingDetails.objects.get(reg_no='AA11SM GP').asset
+        with mock.patch('fleet_manager.signals.index_assets') as index_assets, \
+                self.captureOnCommitCallbacks(execute=True):
+            asset.delete()
+
+        index_assets.assert_not_called()
+        self.assertEqual(self.matches('aa11'), [])
+
+
+class AutocompleteTests(TestCase):
+    def setUp(self):
+        import_fleet()
+        # The index lives in the process, so drop any copy built from another test's data
+        autocomplete.index.invalidate()
+
+    def lookup(self, **params):
+        response = self.client.get(reverse('autocomplete'), params)
+        self.assertEqual(response.status_code, 200)
+        return [(match['field'], match['value']) for match in response.json()['results']]
+
+    def test_prefixes_ignore_case_and_spaces(self):
+        self.assertEqual(self.lookup(q='aa11 s'), [('reg_no', 'AA11SM GP')])
+        self.assertEqual(self.lookup(q='ahta', field='vin'),
+                         [('vin', 'AHTAA3DD50173454'), ('vin', 'AHTAA3DD50173460')])
+        self.assertEqual(len(self.lookup(q='a', field='vin', limit=3)), 3)
+        self.assertEqual(self.lookup(q='zz'), [])
+
+    def test_unknown_field_is_rejected(self):
+        response = self.client.get(reverse('autocomplete'), {'q': 'aa', 'field': 'make'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_unchanged_index_revalidates_and_writes_show_up(self):
+        response = self.client.get(reverse('autocomplete'), {'q': 'zz'})
+        revalidated = self.client.get(reverse('autocomplete'), {'q': 'zz'}, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(revalidated.status_code, 304)
+
+        asset = Asset.objects.get(vin='AHTKFAAG600631850')
+        LicensingDetails.objects.create(asset=asset, reg_no='ZZ99 GP')
+        self.assertEqual(self.lookup(q='zz'), [('reg_no', 'ZZ99 GP')])
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        seed_fleet(23)
+        self.assets = Asset.objects.all()
+
+    def walk(self, cursor=None, backwards=False):
+        pages = []
+        while True:
+            page = keyset_paginate(self.assets, cursor, 5)
+            pages.append([asset.pk for asset in page])
+            cursor = page.previous_cursor if backwards else page.next_cursor
+            if cursor is None:
+                return pages
+
+    def test_keyset_walk_matches_offset_pages(self):
+        paginator = Paginator(self.assets.order_by('id'), 5)
+        offset_pages = [[asset.pk for asset in paginator.page(number)] for number in paginator.page_range]
+
+        self.assertEqual(self.walk(), offset_pages)
+        # Walking back from the last page lines the pages up with the end instead
+        backwards = self.walk(make_cursor(last=True), backwards=True)
+        self.assertEqual([pk for page in backwards[::-1] for pk in page], [pk for page in offset_pages for pk in page])
+        self.assertEqual([len(page) for page in backwards], [5, 5, 5, 5, 3])
+
+    def test_last_page(self):
+        page = keyset_paginate(self.assets, make_cursor(last=True), 5)
+
+        ids = list(self.assets.order_by('id').values_list('id', flat=True))
+        self.assertEqual([asset.pk for asset in page], ids[-5:])
+        self.assertFalse(page.has_next)
+        self.assertIsNone(page.next_cursor)
+        self.assertEqual(page.total_count, 23)
+
+    def test_tampered_cursor_starts_at_the_first_page(self):
+        cursor = make_cursor(after=self.assets.order_by('id')[9].pk)
+        self.assertEqual(read_cursor(cursor), {'after': self.assets.order_by('id')[9].pk})
+
+        forged = signing.dumps({'after': 0}, salt='another.salt', compress=True)
+        for token in [cursor[:-2] + 'xx', forged, 'garbage']:
+            self.assertEqual(read_cursor(token), {})
+        self.assertEqual(self.walk(cursor[:-2] + 'xx')[0], self.walk()[0])
+
+    def test_count_is_recounted_after_a_write(self):
+        self.assertEqual(keyset_paginate(self.assets, None, 5).total_count, 23)
+        with self.assertNumQueries(1):
+            keyset_paginate(self.assets, None, 5)
+
+        Asset.objects.create(make='TOYOTA', model='HILUX', year=2024, vin='COUNT-1',
+                             vehicle_type='Light Vehicle', status='Active')
+        self.assertEqual(keyset_paginate(self.assets, None, 5).total_count, 24)
+
+
+class LicensingViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_query_count_does_not_grow_with_fleet_size(self):
+        seed_fleet(5)
+        with self.assertNumQueries(3):
+            self.client.get(reverse('licensing'))
+
+        seed_fleet(60)
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('licensing'))
+
+        self.assertEqual(len(response.context['discs']), 5)
+
+    def test_discs_expiring_within_30_days_are_flagged(self):
+        seed_fleet(20)
+        LicensingDetails.objects.update(disc_expiry_date=date.today() + timedelta(days=90))
+        soon = LicensingDetails.objects.order_by('id').first()
+        soon.disc_expiry_date = date.today() + timedelta(days=10)
+        soon.save()
+
+        response = self.client.get(reverse('licensing'))
+
+        discs = list(response.context['discs'])
+        self.assertEqual(discs[0].pk, soon.pk)
+        self.assertTrue(discs[0].is_expiring_soon)
+        self.assertFalse(any(disc.is_expiring_soon for disc in discs[1:]))
+        self.assertContains(response, 'class="table-danger"', count=1)
+
+
+class DashboardSummaryCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        seed_fleet(10)
+
+    def test_home_is_served_from_cache_until_an_asset_changes(self):
+        response = self.client.get(reverse('home'))
+        active = Asset.objects.filter(status='Active').count()
+        self.assertEqual(response.context['total_count'], active)
+
+        with self.assertNumQueries(0):
+            self.client.get(reverse('home'))
+
+        asset = Asset.objects.filter(status='Active').first()
+        asset.status = 'Inactive'
+        asset.save()
+
+        response = self.client.get(reverse('home'))
+        self.assertEqual(response.context['total_count'], active - 1)
+
+    def test_finance_summary_is_invalidated_by_financing_changes(self):
+        self.client.get(reverse('finance_summary'))
+        FinancingDetails.objects.create(
+            asset=Asset.objects.first(), funding_institution='NEW BANK', loan_ref_number='1',
+            loan_end_date=date.today(), loan_terms=12, installments=100)
+
+        response = self.client.get(reverse('finance_summary'))
+
+        institutions = [row['funding_institution'] for row in response.context['financed_data']]
+        self.assertIn('NEW BANK', institutions)
+
+
+class FleetRollupTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        seed_fleet(20)
+
+    def test_bulk_seeding_rebuilds_the_rollups(self):
+        self.assertEqual(rollup_differences(), [])
+
+    def test_saves_and_deletes_apply_deltas(self):
+        asset = Asset.objects.filter(status='Active').first()
+        asset.status = 'Inactive'
+        asset.save()
+
+        purchase = PurchaseDetails.objects.exclude(asset=asset).first()
+        purchase.cost_price += 1000
+        purchase.save()
+
+        licence = LicensingDetails.objects.first()
+        licence.disc_expiry_date = None
+        licence.disc_fee = '99.50'
+        licence.save()
+
+        FinancingDetails.objects.create(
+            asset=asset, funding_institution='NEW BANK', loan_ref_number='1',
+            loan_end_date=date.today(), loan_terms=12, installments=100)
+        FinancingDetails.objects.exclude(funding_institution='NEW BANK').first().delete()
+        Asset.objects.exclude(pk=asset.pk).first().delete()
+
+        self.assertEqual(rollup_differences(), [])
+
+    def test_home_reads_one_row_per_vehicle_type(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('home'))
+        self.assertEqual(response.context['total_count'], Asset.objects.filter(status='Active').count())
+
+    def test_deferred_cascade_delete_rebuilds_once(self):
+        remove_seeded_fleet()
+        self.assertFalse(VehicleTypeRollup.objects.exists())
+
+
+def run_reminders():
+    """Runs the reminder coordinator with its chunk tasks executed inline; returns the enqueued chunk args."""
+    with run_tasks_inline('fleet_manager.tasks.async_task') as async_task:
+        send_vehicle_expiry_reminder()
+    return [call.args[1:] for call in async_task.call_args_list]
+
+
+@override_settings(EXPIRY_REMINDER_RECIPIENTS={
+    'default': ['fleet@example.com'],
+    'BEN': ['bench@example.com'],
+})
+class ExpiryReminderDigestTests(TestCase):
+    def setUp(self):
+        seed_fleet(30)
+        LicensingDetails.objects.update(disc_expiry_date=date.today() + timedelta(days=90))
+        self.expiring = list(LicensingDetails.objects.order_by('id')[:12])
+        for licence in self.expiring[:4]:
+            licence.fleet_no = 'SIM 001'
+        for licence in self.expiring:
+            licence.disc_expiry_date = date.today() + timedelta(days=5)
+        LicensingDetails.objects.bulk_update(self.expiring, ['fleet_no', 'disc_expiry_date'])
+
+    def test_one_digest_per_recipient_list(self):
+        self.assertEqual(len(run_reminders()), 1)
+
+        self.assertEqual(len(mail.outbox), 2)
+        by_recipient = {message.to[0]: message for message in mail.outbox}
+        self.assertEqual(by_recipient['bench@example.com'].body.count('VIN: '), 8)
+        self.assertEqual(by_recipient['fleet@example.com'].body.count('VIN: '), 4)
+        self.assertIn('Fleet SIM', by_recipient['fleet@example.com'].body)
+
+    def test_large_digests_are_split_into_parts(self):
+        with self.settings(EXPIRY_REMINDER_RECIPIENTS={'default': ['fleet@example.com']}), \
+                mock.patch('fleet_manager.reminders.MAX_LICENCES_PER_DIGEST', 5):
+            digests = build_digests(LicensingDetails.objects.filter(pk__in=[l.pk for l in self.expiring]))
+
+        self.assertEqual([len(digest.licences) for digest in digests], [5, 5, 2])
+        self.assertTrue(digests[0].message().subject.endswith('(1/3)'))
+
+    def test_reminders_are_sent_once_per_expiry_date(self):
+        expired = self.expiring[-1]
+        expired.disc_expiry_date = date.today() - timedelta(days=1)
+        expired.save()
+        run_reminders()
+        self.assertEqual(sum(m.body.count('VIN: ') for m in mail.outbox), 11)
+
+        mail.outbox = []
+        self.assertEqual(run_reminders(), [])
+        self.assertEqual(mail.outbox, [])
+
+        renewed = self.expiring[0]
+        renewed.disc_expiry_date = date.today() + timedelta(days=20)
+        renewed.save()
+        run_reminders()
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertIn(renewed.reg_no, mail.outbox[0].body)
+
+    def test_due_licences_are_split_into_id_ranges(self):
+        with mock.patch('fleet_manager.tasks.REMINDER_CHUNK_SIZE', 5):
+            chunks = run_reminders()
+
+        ids = [licence.pk for licence in self.expiring]
+        self.assertEqual([chunk[:2] for chunk in chunks], [(ids[0], ids[4]), (ids[5], ids[9]), (ids[10], ids[11])])
+        self.assertEqual(sum(m.body.count('VIN: ') for m in mail.outbox), 12)
+
+    def test_failed_chunks_are_retried_then_given_up(self):
+        with mock.patch('fleet_manager.tasks.async_task') as async_task:
+            reminder_chunk_done(SimpleNamespace(args=(1, 9, 1), success=False, result='SMTP down', group='g'))
+            reminder_chunk_done(SimpleNamespace(args=(1, 9, 3), success=False, result='SMTP down', group='g'))
+
+        async_task.assert_called_once()
+        self.assertEqual(async_task.call_args.args[1:], (1, 9, 2))
+
+    def test_timed_out_chunks_count_as_attempts(self):
+        def timed_out(attempt):
+            return SimpleNamespace(args=(1, 9, attempt), success=True, group='g',
+                                   result={'sent': 0, 'licences': 0, 'remaining': 2})
+
+        with mock.patch('fleet_manager.tasks.async_task') as async_task:
+            reminder_chunk_done(timed_out(1))
+            reminder_chunk_done(timed_out(3))
+
+        async_task.assert_called_once()
+        self.assertEqual(async_task.call_args.args[1:], (1, 9, 2))
+
+    def test_chunk_stops_before_the_task_timeout(self):
+        with mock.patch('fleet_manager.tasks.REMINDER_TIME_BUDGET', 0):
+            result = send_reminder_chunk(self.expiring[0].pk, self.expiring[-1].pk)
+        self.assertEqual(result, {'sent': 0, 'licences': 0, 'remaining': 2})
+        self.assertEqual(mail.outbox, [])
+
+    def test_schedule_registration_is_idempotent(self):
+        from django_q.models import Schedule
+        from django_q.tasks import schedule
+
+        schedule('fleet_manager.tasks.send_vehicle_expiry_reminder', schedule_type='D')
+        register_schedules()
+        register_schedules()
+
+        schedules = Schedule.objects.filter(func='fleet_manager.tasks.send_vehicle_expiry_reminder')
+        self.assertEqual(schedules.count(), 1)
+
+
+class AssetDetailViewTests(TestCase):
+    def setUp(self):
+        seed_fleet(1)
+        self.asset = Asset.objects.get()
+        self.url = reverse('asset-detail', args=[self.asset.pk])
+
+    def test_json_detail_loads_related_records_in_one_round(self):
+        with self.assertNumQueries(4):
+            response = self.client.get(self.url, {'format': 'json'})
+
+        data = response.json()
+        self.assertEqual(data['vin'], self.asset.vin)
+        self.assertEqual(data['purchase']['cost_price'], str(self.asset.purchasedetails.cost_price))
+        self.assertEqual(len(data['licensing']), 1)
+
+    def test_unchanged_asset_is_not_modified(self):
+        response = self.client.get(self.url, HTTP_ACCEPT='application/json')
+        with self.assertNumQueries(1):
+            cached = self.client.get(self.url, HTTP_ACCEPT='application/json', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(cached.status_code, 304)
+
+        licence = LicensingDetails.objects.get()
+        licence.disc_fee = 1
+        licence.save()
+        response = self.client.get(self.url, HTTP_ACCEPT='application/json', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+
+    def test_html_and_json_have_different_etags(self):
+        html = self.client.get(self.url)
+        self.assertContains(html, 'Purchase Details')
+        self.assertNotEqual(html['ETag'], self.client.get(self.url, {'format': 'json'})['ETag'])
+
+
+class AssetApiTests(TestCase):
+    def setUp(self):
+        seed_fleet(25)
+
+    def test_pages_walk_the_whole_filtered_fleet(self):
+        url = reverse('api_assets') + '?type=inactive&limit=4&fields=vin'
+        seen = []
+        while url:
+            data = self.client.get(url).json()
+            self.assertEqual(data['fields'], ['id', 'vin'])
+            seen.extend(row[0] for row in data['results'])
+            url = data['next']
+
+        inactive = Asset.objects.filter(status='Inactive').order_by('id')
+        self.assertEqual(seen, list(inactive.values_list('id', flat=True)))
+
+    def test_page_queries_are_bounded(self):
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('api_assets'), {
+                'fields': 'vin,cost_price,funding_institution,reg_no', 'limit': 20})
+        rows = response.json()['results']
+        self.assertEqual(len(rows), 20)
+        self.assertEqual(len(rows[0]), 5)
+
+    def test_unknown_fields_are_rejected(self):
+        response = self.client.get(reverse('api_assets'), {'fields': 'vin,secret'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('secret', response.json()['error'])
+
+
+class BulkAssetEditTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        seed_fleet(15)
+        self.admin = User.objects.create_superuser('admin', 'admin@example.com', 'pw')
+        self.client.force_login(self.admin)
+        self.url = reverse('api_assets_bulk')
+
+    def post(self, items):
+        return self.client.post(self.url, {'items': items}, content_type='application/json')
+
+    def test_status_change_is_one_update_and_keeps_summaries_consistent(self):
+        self.client.get(reverse('home'))
+        active = list(Asset.objects.filter(status='Active').order_by('id')[:5])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.post([{'vin': asset.vin, 'status': 'Inactive'} for asset in active])
+
+        self.assertEqual([r['status'] for r in response.json()['results']], ['updated'] * 5)
+        self.assertEqual(Asset.objects.filter(pk__in=[a.pk for a in active], status='Inactive').count(), 5)
+        self.assertEqual(rollup_differences(), [])
+        home = self.client.get(reverse('home'))
+        self.assertEqual(home.context['total_count'], Asset.objects.filter(status='Active').count())
+
+    def test_mixed_changes_use_bulk_update(self):
+        first, second = Asset.objects.order_by('id')[:2]
+        response = self.post([
+            {'id': first.pk, 'make': 'RENAMED'},
+            {'id': second.pk, 'year': '2001', 'vehicle_type': 'Trailer'},
+        ])
+
+        self.assertEqual(response.status_code, 200)
+        second.refresh_from_db()
+        self.assertEqual((second.year, second.vehicle_type), (2001, 'Trailer'))
+        self.assertEqual(Asset.objects.get(pk=first.pk).make, 'RENAMED')
+        self.assertEqual(rollup_differences(), [])
+
+    def test_invalid_batches_change_nothing(self):
+        asset = Asset.objects.first()
+        response = self.post([
+            {'id': asset.pk, 'status': 'Inactive' if asset.status == 'Active' else 'Active'},
+            {'vin': 'NO-SUCH-VIN', 'status': 'Inactive'},
+            {'id': asset.pk, 'vin': asset.vin},
+            {'id': asset.pk, 'year': 'soon'},
+        ])
+
+        self.assertEqual(response.status_code, 400)
+        statuses = [r['status'] for r in response.json()['results']]
+        self.assertEqual(statuses, ['not_applied', 'not_found', 'invalid', 'invalid'])
+        self.assertEqual(Asset.objects.get(pk=asset.pk).status, asset.status)
+
+    def test_malformed_references_are_invalid_items(self):
+        asset = Asset.objects.first()
+        response = self.post([
+            {'id': [asset.pk], 'status': 'Inactive'},
+            {'vin': {'vin': asset.vin}, 'status': 'Inactive'},
+            {'id': True, 'status': 'Inactive'},
+            {'id': 2 ** 64, 'status': 'Inactive'},
+            {'vin': asset.vin, 'status': 'Inactive'},
+        ])
+
+        self.assertEqual(response.status_code, 400)
+        results = response.json()['results']
+        self.assertEqual([r['status'] for r in results], ['invalid'] * 4 + ['not_applied'])
+        self.assertEqual(results[1]['errors'], {'__all__': 'The vin must be a string.'})
+
+    def test_only_admins_can_bulk_edit(self):
+        self.client.logout()
+        self.assertEqual(self.post([]).status_code, 403)
+
+    def test_admin_action_rolls_back_every_batch_when_one_fails(self):
+        active = list(Asset.objects.filter(status='Active').order_by('id')[:4])
+        calls = []
+
+        def fail_second_batch(items):
+            calls.append(items)
+            if len(calls) == 2:
+                raise BulkEditError([{'index': 0, 'status': 'not_found'}, {'index': 1, 'status': 'not_applied'}])
+            return bulk_edit_assets(items)
+
+        with mock.patch('fleet_manager.admin.MAX_BULK_ITEMS', 2), \
+                mock.patch('fleet_manager.admin.bulk_edit_assets', side_effect=fail_second_batch):
+            response = self.client.post(reverse('admin:fleet_manager_asset_changelist'), {
+                'action': 'mark_inactive', '_selected_action': [asset.pk for asset in active],
+            }, follow=True)
+
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(Asset.objects.filter(pk__in=[a.pk for a in active], status='Active').count(), 4)
+        [message] = response.context['messages']
+        self.assertEqual(message.level, messages.ERROR)
+        self.assertEqual(str(message), 'No assets were marked Inactive: 1 of the selected assets could not be changed.')
+
+
+class EditAssetViewTests(TestCase):
+    def setUp(self):
+        seed_fleet(1)
+        Asset.objects.update(status='Active')
+        self.asset = Asset.objects.get()
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'pw'))
+        self.url = reverse('edit_asset', args=[self.asset.pk])
+
+    def form(self, **changes):
+        data = {name: getattr(self.asset, name) for name in
+                ('year', 'make', 'model', 'vehicle_type', 'sub_category', 'classification', 'status')}
+        return {**data, 'version': self.asset.version, **changes}
+
+    def test_only_changed_fields_are_written(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.url, self.form(make='RENAMED'))
+
+        self.assertRedirects(response, reverse('asset-detail', args=[self.asset.pk]), fetch_redirect_response=False)
+        update = next(q['sql'] for q in queries if q['sql'].startswith('UPDATE "fleet_manager_asset"'))
+        self.assertIn('"make"', update)
+        self.assertNotIn('"status"', update)
+        self.asset.refresh_from_db()
+        self.assertEqual((self.asset.make, self.asset.version), ('RENAMED', 2))
+
+    def test_stale_version_is_a_conflict(self):
+        stale = self.form(status='Inactive')
+        self.client.post(self.url, self.form(make='FIRST'))
+
+        response = self.client.post(self.url, stale)
+
+        self.assertEqual(response.status_code, 409)
+        self.asset.refresh_from_db()
+        self.assertEqual((self.asset.make, self.asset.status), ('FIRST', 'Active'))
+
+
+@override_settings(FLEET_PROFILING=True, FLEET_PROFILING_DUPLICATE_THRESHOLD=3)
+class ProfilingMiddlewareTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        seed_fleet(5)
+
+    def test_fleet_views_are_logged_with_query_and_template_timings(self):
+        with self.assertLogs('fleet_manager.profiling', 'INFO') as logs:
+            response = self.client.get(reverse('licensing'))
+
+        self.assertIn('(licensing) 200', logs.output[0])
+        self.assertIn('3 queries', logs.output[0])
+        self.assertIn('tpl;dur=', response['Server-Timing'])
+
+    def test_repeated_queries_are_reported(self):
+        def n_plus_one(request):
+            for licence in LicensingDetails.objects.all():
+                licence.asset.vin
+            return HttpResponse()
+
+        request = RequestFactory().get('/license/')
+        request.resolver_match = resolve('/license/')
+        with self.assertLogs('fleet_manager.profiling', 'WARNING') as logs:
+            ProfilingMiddleware(n_plus_one)(request)
+
+        self.assertIn('repeated 5x', logs.output[0])
+
+    @override_settings(FLEET_PROFILING=False)
+    def test_disabled_middleware_is_removed(self):
+        with self.assertRaises(MiddlewareNotUsed):
+            ProfilingMiddleware(lambda request: HttpResponse())
+
+
+class ViewQueryBudgetTests(TempMediaRootMixin, TestCase):
+    def test_views_stay_within_their_query_budgets_as_the_fleet_grows(self):
+        for size in (10, 120):
+            seed_fleet(size - Asset.objects.count())
+            asset_id = Asset.objects.order_by('id').first().pk
+            for name, url, params, budget in benchmark_requests({'asset': asset_id}, size):
+                with self.subTest(view=name, assets=size):
+                    response, queries = count_queries(lambda: fetch(self.client, url, params))
+                    self.assertEqual(response.status_code, 200)
+                    self.assertLessEqual(queries, budget)
+            # The search budget only means something if the seeded assets are indexed
+            self.assertEqual(search_assets('bench').count(), size)
+
+    def test_signed_in_views_and_background_tasks_stay_within_their_query_budgets(self):
+        seed_fleet(120)
+        user = User.objects.create_user(SEED_USERNAME)
+        self.client.force_login(user)
+        job = ExportJob.objects.create(columns='vin,make', created_by=user)
+        url_args = {'asset': Asset.objects.order_by('id').first().pk, 'export_job': job.pk}
+        for name, url, params, budget in benchmark_requests(url_args, 120, SIGNED_IN_VIEW_BENCHMARKS):
+            with self.subTest(view=name):
+                response, queries = count_queries(lambda: fetch(self.client, url, params))
+                self.assertEqual(response.status_code, 200)
+                self.assertLessEqual(queries, budget)
+
+        _, queries = count_queries(run_export_benchmark)
+        self.assertLessEqual(queries, export_job_query_budget(120))
+        self.assertEqual(ExportJob.objects.count(), 1)
+
+        clear_seeded_reminders()
+        due = reminders_due(date.today()).count()
+        self.assertGreater(due, 0)
+        _, queries = count_queries(run_reminder_benchmark)
+        self.assertLessEqual(queries, reminder_query_budget(due))
+        self.assertEqual(ExpiryReminder.objects.count(), due)
+
+
+class AsyncReadViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        seed_fleet(12)
+        self.user = User.objects.create_user('viewer', 'viewer@example.com', 'pw')
+
+    async def test_read_views_render_under_asgi(self):
+        await self.async_client.aforce_login(self.user)
+        for name in ('home', 'asset_list', 'truck_list', 'finance_summary', 'licensing'):
+            with self.subTest(view=name):
+                response = await self.async_client.get(reverse(name))
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.context['user'], self.user)
+
+        response = await self.async_client.get(reverse('search'), {'q': 'bench'})
+        self.assertEqual(len(response.context['results']), 12)
+
+    async def test_export_streams_the_same_rows_under_asgi_and_wsgi(self):
+        params = {'columns': 'vin,make,cost_price,funding_institution,reg_no'}
+        streamed = await self.async_client.get(reverse('export_assets'), params)
+        self.assertTrue(streamed.is_async)
+        body = b''.join([chunk async for chunk in streamed.streaming_content])
+
+        def sync_export():
+            response = self.client.get(reverse('export_assets'), params)
+            self.assertFalse(response.is_async)
+            return b''.join(response.streaming_content)
+
+        self.assertEqual(body, await sync_to_async(sync_export)())
+        self.assertEqual(body.count(b'\r\n'), await Asset.objects.filter(status='Active').acount() + 1)
+
+
+class PageCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        seed_fleet(12)
+
+    def test_anonymous_pages_are_served_from_cache_until_the_data_changes(self):
+        first = self.client.get(reverse('asset_list'))
+        with self.assertNumQueries(0):
+            second = self.client.get(reverse('asset_list'))
+        self.assertEqual(second.status_code, 200)
+        self.assertNotIn(CSRF_PLACEHOLDER.encode(), second.content)
+        self.assertIn('csrftoken', second.cookies)
+
+        asset = Asset.objects.filter(status='Active').order_by('id').first()
+        asset.make = 'Renamed'
+        asset.save()
+
+        third = self.client.get(reverse('asset_list'))
+        self.assertNotIn(b'Renamed', first.content)
+        self.assertIn(b'Renamed', third.content)
+
+    def test_pages_are_keyed_on_the_parameters_the_view_reads(self):
+        self.client.get(reverse('asset_list'))
+        with self.assertNumQueries(0):
+            self.client.get(reverse('asset_list'), {'utm_source': 'mail', 'cursor': ''},
+                            HTTP_ACCEPT='text/html,application/xhtml+xml,*/*;q=0.8')
+
+        first_id = Asset.objects.filter(status='Active').order_by('id').first().pk
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('asset_list'), {'cursor': make_cursor(after=first_id)})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(queries)
+
+    def test_table_fragments_are_cached_for_signed_in_users(self):
+        self.client.force_login(User.objects.create_user('viewer', 'viewer@example.com', 'pw'))
+        self.client.get(reverse('licensing'))
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('licensing'))
+        self.assertContains(response, 'table-danger')
+        self.assertFalse([q for q in queries if 'fleet_manager_licensingdetails' in q['sql']])
+
+        LicensingDetails.objects.update(disc_expiry_date=date.today() + timedelta(days=90))
+        bump_data_versions('LicensingDetails')
+        self.assertNotContains(self.client.get(reverse('licensing')), 'table-danger')
+
+    def test_bulk_edits_bump_the_asset_version(self):
+        before = data_version('Asset')
+        with self.captureOnCommitCallbacks(execute=True):
+            bulk_edit_assets([{'id': Asset.objects.first().pk, 'status': 'Inactive'}])
+        self.assertNotEqual(data_version('Asset'), before)
+
+
+def image_upload(name='me.png', size=(400, 300)):
+    buffer = BytesIO()
+    Image.new('RGBA', size, (200, 30, 30, 128)).save(buffer, 'PNG')
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+
+class AvatarThumbnailTests(TempMediaRootMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('driver', 'driver@example.com', 'pw')
+
+    def upload_picture(self):
+        self.user.profile_picture = image_upload()
+        with run_tasks_inline('fleet_manager.signals.async_task') as async_task, \
+                self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+        self.user.refresh_from_db()
+        return async_task
+
+    def test_uploads_get_square_content_hashed_thumbnails(self):
+        self.upload_picture()
+
+        self.assertEqual(set(self.user.avatar_thumbnails), {'36', '72'})
+        name = self.user.avatar_thumbnails['72']['webp']
+        self.assertRegex(name, r'^avatars/[0-9a-f]{16}\.webp$')
+        with default_storage.open(name) as f, Image.open(f) as thumbnail:
+            self.assertEqual((thumbnail.format, thumbnail.size), ('WEBP', (72, 72)))
+
+        response = self.client.get(reverse('avatar', args=[name.removeprefix('avatars/')]))
+        self.assertEqual(response['Content-Type'], 'image/webp')
+        self.assertIn('max-age=31536000', response['Cache-Control'])
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertEqual(self.client.get(reverse('avatar', args=['0123456789abcdef.webp'])).status_code, 404)
+
+    def test_layout_serves_thumbnails_instead_of_the_original(self):
+        self.upload_picture()
+        self.client.force_login(self.user)
+
+        response = self.client.get(reverse('edit_profile'))
+        self.assertContains(response, '<source type="image/webp"')
+        self.assertNotContains(response, self.user.profile_picture.url)
+
+    def test_saves_that_keep_the_picture_queue_nothing(self):
+        self.upload_picture()
+        with mock.patch('fleet_manager.signals.async_task') as async_task, \
+                self.captureOnCommitCallbacks(execute=True):
+            self.user.first_name = 'Renamed'
+            self.user.save()
+        async_task.assert_not_called()
+        self.assertTrue(User.objects.get(pk=self.user.pk).avatar_thumbnails)
+
+    def test_backfill_makes_missing_thumbnails(self):
+        self.upload_picture()
+        User.objects.filter(pk=self.user.pk).update(avatar_thumbnails={})
+
+        call_command('backfill_avatars', stdout=StringIO())
+        self.assertEqual(set(User.objects.get(pk=self.user.pk).avatar_thumbnails), {'36', '72'})
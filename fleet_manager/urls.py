@@ -8,6 +8,7 @@ urlpatterns = [
     path("logout/", views.logout_view, name="logout"),
     path("register/", views.register, name="register"),
     path("edit_profile/", views.edit_profile, name="edit_profile"),
+    path("avatars/<str:name>", views.avatar_file, name="avatar"),
     path('trucks/', views.truck_list, name='truck_list'),
     path('trailers/', views.trailer_list, name='trailer_list'),
     path('light/', views.light_list, name='light_list'),
@@ -16,7 +17,14 @@ urlpatterns = [
     path('license/', views.licensing, name='licensing'),
     path('asset/<int:asset_id>/', views.asset_view, name='asset-detail'),
     path('search/', views.search_view, name='search'),
+    path('search/autocomplete/', views.autocomplete_view, name='autocomplete'),
     path('add-asset/', views.add_asset, name='add_asset'),
     path('asset/<int:asset_id>/edit/', views.edit_asset_view, name='edit_asset'),
     path('assets/export/', views.export_assets, name='export_assets'),
+    path('assets/export/jobs/', views.create_export_job, name='create_export_job'),
+    path('assets/export/jobs/<uuid:job_id>/', views.export_job, name='export_job'),
+    path('assets/export/jobs/<uuid:job_id>/status/', views.export_job_status, name='export_job_status'),
+    path('assets/export/jobs/<uuid:job_id>/download/', views.export_job_download, name='export_job_download'),
+    path('api/assets/', views.api_assets, name='api_assets'),
+    path('api/assets/bulk/', views.api_assets_bulk, name='api_assets_bulk'),
 ]
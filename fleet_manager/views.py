@@ -1,39 +1,56 @@
+import json
+
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import HttpResponse, HttpResponseRedirect
+from django.http import (
+    FileResponse, Http404, HttpResponseBadRequest, HttpResponseRedirect, JsonResponse,
+    StreamingHttpResponse,
+)
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, etag, require_POST
+from django.views.decorators.gzip import gzip_page
+from django.views.decorators.vary import vary_on_headers
+from django_q.tasks import async_task
+from django.template.loader import render_to_string
 from django.urls import reverse
-from django.db import IntegrityError
-from django.core.paginator import Paginator
-from datetime import date, timedelta, datetime
-from django.db.models.functions import ExtractMonth
-import csv
-
-from .models import User, Asset, PurchaseDetails, FinancingDetails, LicensingDetails
-from django.db.models import Sum, Count
-
+from django.utils.safestring import mark_safe
+from django.core.exceptions import ValidationError
+from django.core.files.storage import default_storage
+from django.core.handlers.asgi import ASGIRequest
+from django.db import IntegrityError, transaction
+from datetime import date, timedelta
+
+from .models import DEFAULT_PROFILE_PICTURE, User, Asset, PurchaseDetails, FinancingDetails, LicensingDetails, ExportJob
+from django.db.models import BooleanField, Case, Value, When
+
+from .avatars import AVATAR_CACHE_SECONDS, AVATAR_CONTENT_TYPES, AVATAR_DIR, AVATAR_NAME_RE
+from .bulk import BULK_EDITABLE_FIELDS, BulkEditError, bulk_edit_assets
 from .forms import EditProfileForm, AssetForm
+from .page_cache import acached_fragment, cache_anonymous_page
+from .pagination import aget_page, akeyset_paginate, make_cursor, read_cursor
+from .search import search_assets
+from .serializers import COMPACT_JSON, asset_detail_data
+from . import autocomplete, summaries
+from .exports import (
+    ASSET_FILTERS, ASYNC_EXPORT_WRITERS, EXPORT_FORMATS, EXPORT_JOB_TIMEOUT, aexport_chunks, aiterate,
+    assets_for_export, export_chunks, parse_columns, pyarrow,
+)
 
 
-def home(request):
-    # Count and total cost per vehicle type
-    vehicle_summary = Asset.objects.filter(status='Active').values('vehicle_type').annotate(
-        total_cost=Sum('purchasedetails__cost_price'),
-        count=Count('id')
-    ).order_by('vehicle_type')
+async def arender(request, template_name, context=None):
+    """render() for async views: loads the user with the async ORM first, as the layout reads it."""
+    request.user = await request.auser()
+    return render(request, template_name, context)
 
-    # Calculate overall totals
-    total_count = sum(item['count'] for item in vehicle_summary)
-    total_cost = sum(item['total_cost'] for item in vehicle_summary if item['total_cost'] is not None)
 
-    context = {
-        'vehicle_summary': vehicle_summary,
-        'total_count': total_count,
-        'total_cost': total_cost,
-    }
+@cache_anonymous_page("Asset", "PurchaseDetails")
+async def home(request):
+    # Count and total cost per vehicle type, with overall totals
+    context = await summaries.avehicle_summary()
 
-    return render(request, 'fleet_manager/home.html', context)
+    return await arender(request, 'fleet_manager/home.html', context)
 
 
 def login_view(request):
@@ -82,7 +99,7 @@ def register(request):
             if profile_picture:
                 user.profile_picture = profile_picture  # Assign profile picture
             else:
-                user.profile_picture = "profile_pics/avator.png"  # Default avatar
+                user.profile_picture = DEFAULT_PROFILE_PICTURE  # Default avatar
 
             user.save()
         except IntegrityError:
@@ -112,157 +129,203 @@ def edit_profile(request):
     return render(request, "fleet_manager/edit_profile.html", {"form": form})
 
 
-def asset_list(request):
-    assets = Asset.objects.filter(status='Active')
-    title = "All Assets"
-    export_url = reverse('export_assets') + "?vehicle_type=all"
+async def render_asset_list(request, export_type, title):
+    """Renders a keyset-paginated page of the assets matching an export filter."""
+    cursor = request.GET.get("cursor")
 
-    paginator = Paginator(assets, 10)
-    page_number = request.GET.get("page")
-    assets = paginator.get_page(page_number)
-
-    return render(request, 'fleet_manager/asset_list.html', {'assets': assets, 'title': title, 'export_url': export_url})
+    async def render_table():
+        assets, _ = assets_for_export(export_type)
+        page = await akeyset_paginate(assets, cursor, 10)
+        return (render_to_string('fleet_manager/fragments/asset_rows.html', {'assets': page}),
+                render_to_string('fleet_manager/fragments/asset_pager.html', {'assets': page}))
 
+    # The table and pager are cached until an asset changes
+    rows, pager = await acached_fragment("asset_table", ["Asset"], [export_type, cursor], render_table)
+    export_url = reverse('export_assets') + f"?vehicle_type={export_type}"
 
-def truck_list(request):
-    filtered_assets = Asset.objects.filter(vehicle_type='Truck', status='Active')
-    title = "Trucks"
-    export_url = reverse('export_assets') + "?vehicle_type=truck"
+    return await arender(request, 'fleet_manager/asset_list.html', {'asset_rows': mark_safe(rows), 'asset_pager': mark_safe(pager), 'title': title, 'export_url': export_url, 'export_type': export_type})
 
-    paginator = Paginator(filtered_assets, 10)
-    page_number = request.GET.get("page")
-    filtered_assets = paginator.get_page(page_number)
 
-    return render(request, 'fleet_manager/asset_list.html', {'assets': filtered_assets, 'title': title, 'export_url': export_url})
+@cache_anonymous_page("Asset", params=["cursor"])
+async def asset_list(request):
+    return await render_asset_list(request, "all", "All Assets")
 
 
-def trailer_list(request):
-    filtered_assets = Asset.objects.filter(vehicle_type='Trailer', status='Active')
-    title = "Trailers"
-    export_url = reverse('export_assets') + "?vehicle_type=trailer"
+@cache_anonymous_page("Asset", params=["cursor"])
+async def truck_list(request):
+    return await render_asset_list(request, "truck", "Trucks")
 
-    paginator = Paginator(filtered_assets, 10)
-    page_number = request.GET.get("page")
-    filtered_assets = paginator.get_page(page_number)
 
-    return render(request, 'fleet_manager/asset_list.html', {'assets': filtered_assets, 'title': title, 'export_url': export_url})
+@cache_anonymous_page("Asset", params=["cursor"])
+async def trailer_list(request):
+    return await render_asset_list(request, "trailer", "Trailers")
 
 
-def light_list(request):
-    filtered_assets = Asset.objects.filter(vehicle_type='Light Vehicle', status='Active')
-    title = "Light Vehicles"
-    export_url = reverse('export_assets') + "?vehicle_type=light"
+@cache_anonymous_page("Asset", params=["cursor"])
+async def light_list(request):
+    return await render_asset_list(request, "light", "Light Vehicles")
 
-    paginator = Paginator(filtered_assets, 10)
-    page_number = request.GET.get("page")
-    filtered_assets = paginator.get_page(page_number)
 
-    return render(request, 'fleet_manager/asset_list.html', {'assets': filtered_assets, 'title': title, 'export_url': export_url})
+@cache_anonymous_page("Asset", params=["cursor"])
+async def inactive_list(request):
+    return await render_asset_list(request, "inactive", "Inactive Vehicles")
 
 
-def inactive_list(request):
-    filtered_assets = Asset.objects.filter(status='Inactive')
-    title = "Inactive Vehicles"
-    export_url = reverse('export_assets') + "?vehicle_type=inactive"
+@cache_anonymous_page("FinancingDetails")
+async def finance_summary(request):
+    context = {
+        # Count and sum of installments per funding institution
+        'financed_data': await summaries.afinance_summary(),
+    }
 
-    paginator = Paginator(filtered_assets, 10)
-    page_number = request.GET.get("page")
-    filtered_assets = paginator.get_page(page_number)
+    return await arender(request, 'fleet_manager/finance.html', context)
 
-    return render(request, 'fleet_manager/asset_list.html', {'assets': filtered_assets, 'title': title, 'export_url': export_url})
 
+def disc_queryset(today):
+    today_plus_30 = today + timedelta(days=30)
 
-def finance_summary(request):
-    financed_data = FinancingDetails.objects.values('funding_institution').annotate(
-        count=Count('id'),  # Count of assets financed by this institution
-        # Sum of installments for this institution
-        total_installments=Sum('installments')
+    # Flag discs expiring within 30 days in SQL, and join the asset for its model
+    return (
+        LicensingDetails.objects
+        .select_related('asset')
+        .only('reg_no', 'fleet_no', 'disc_fee', 'disc_expiry_date', 'asset', 'asset__model')
+        .annotate(is_expiring_soon=Case(
+            When(disc_expiry_date__lte=today_plus_30, then=Value(True)),
+            default=Value(False),
+            output_field=BooleanField(),
+        ))
+        .order_by('disc_expiry_date', 'id')
     )
 
-    context = {
-        'financed_data': financed_data,
-    }
 
-    return render(request, 'fleet_manager/finance.html', context)
+@cache_anonymous_page("LicensingDetails", "Asset", params=["page"])
+async def licensing(request):
+    today = date.today()
+    page_number = request.GET.get("page")
 
+    async def render_table():
+        discs = await aget_page(disc_queryset(today), page_number, 5)
+        return (render_to_string('fleet_manager/fragments/disc_rows.html', {'discs': discs}),
+                render_to_string('fleet_manager/fragments/disc_pager.html', {'discs': discs}))
 
-def licensing(request):
-    today = date.today()
-    today_plus_30 = today + timedelta(days=30)
+    # Cached until a disc or asset changes, and per day for the expiring-soon flags
+    rows, pager = await acached_fragment(
+        "disc_table", ["LicensingDetails", "Asset"], [page_number, today], render_table)
 
-    discs = LicensingDetails.objects.all().order_by('disc_expiry_date')  
+    # Discs and fees per expiry month
+    monthly_summary = await summaries.aexpiry_summary()
 
-    for disc in discs:
-        disc.is_expiring_soon = disc.disc_expiry_date and disc.disc_expiry_date <= today_plus_30
+    return await arender(request, 'fleet_manager/licensing.html', {'disc_rows': mark_safe(rows), 'disc_pager': mark_safe(pager), 'monthly_summary': monthly_summary})
 
-    paginator = Paginator(discs, 5)
-    page_number = request.GET.get("page")
-    discs = paginator.get_page(page_number)
 
-     # Aggregate expiry data by month
-    monthly_expiries = (
-        LicensingDetails.objects
-        .values(month=ExtractMonth('disc_expiry_date'))
-        .annotate(
-            num_vehicles=Count('id'),
-            total_fees=Sum('disc_fee')
-        )
-        .order_by('month')
-    )
+def asset_detail_queryset():
+    # The asset and its purchase in one join, financing and licensing in one query each
+    return Asset.objects.select_related("purchasedetails").prefetch_related(
+        "financingdetails_set", "licensingdetails_set")
 
-    # Convert month number to name (e.g., 1 → January)
-    month_map = {i: datetime(2000, i, 1).strftime('%B') for i in range(1, 13)}
-    monthly_summary = [
-        {
-            "month": month_map.get(item["month"], "Unknown"),
-            "num_vehicles": item["num_vehicles"],
-            "total_fees": item["total_fees"] or 0  # Ensure no None values
-        }
-        for item in monthly_expiries
-    ]
 
-    return render(request, 'fleet_manager/licensing.html', {'discs': discs, 'monthly_summary': monthly_summary})
+def wants_json(request):
+    return request.GET.get("format") == "json" or (
+        request.get_preferred_type(["text/html", "application/json"]) == "application/json")
 
 
-def asset_view(request, asset_id):
-    # Get the asset or return a 404 error if not found
-    asset = get_object_or_404(Asset, id=asset_id)
+def asset_last_modified(request, asset_id):
+    # Shared by the ETag and Last-Modified checks, so a 304 costs one query
+    if not hasattr(request, "asset_updated_at"):
+        request.asset_updated_at = (
+            Asset.objects.filter(id=asset_id).values_list("updated_at", flat=True).first())
+    return request.asset_updated_at
+
+
+def asset_etag(request, asset_id):
+    updated_at = asset_last_modified(request, asset_id)
+    if updated_at is None:
+        return None
+    # The HTML page differs per user (edit controls, CSRF token)
+    representation = "json" if wants_json(request) else f"html-{request.user.pk}"
+    return f"{asset_id}-{updated_at.timestamp()}-{representation}"
 
-    # Fetch related data
-    purchase_details = PurchaseDetails.objects.filter(asset=asset).first()
-    financing_details = FinancingDetails.objects.filter(asset=asset)
-    licensing_details = LicensingDetails.objects.filter(asset=asset)
+
+def render_asset_detail(request, asset_id, status=200, message=None):
+    asset = get_object_or_404(asset_detail_queryset(), id=asset_id)
+
+    if wants_json(request):
+        return JsonResponse(asset_detail_data(asset), json_dumps_params=COMPACT_JSON)
 
     context = {
         "asset": asset,
-        "purchase_details": purchase_details,
-        "financing_details": financing_details,
-        "licensing_details": licensing_details,
+        "purchase_details": getattr(asset, "purchasedetails", None),
+        "financing_details": asset.financingdetails_set.all(),
+        "licensing_details": asset.licensingdetails_set.all(),
+        "message": message,
     }
 
-    return render(request, "fleet_manager/asset_screen.html", context)
+    return render(request, "fleet_manager/asset_screen.html", context, status=status)
+
+
+@condition(etag_func=asset_etag, last_modified_func=asset_last_modified)
+@vary_on_headers("Accept", "Cookie")
+@cache_control(private=True, no_cache=True)
+@cache_anonymous_page("Asset", "PurchaseDetails", "FinancingDetails", "LicensingDetails", params=["format"])
+def asset_view(request, asset_id):
+    """The asset detail page, or its JSON representation for ?format=json or Accept: application/json.
+
+    Revalidated on every view; unchanged assets get a 304 from the ETag or Last-Modified check.
+    """
+    return render_asset_detail(request, asset_id)
 
 
-def search_view(request):
+async def search_view(request):
     query = request.GET.get('q', '')
-    if query:
-        # Perform search query including VIN
-        results = Asset.objects.filter(
-            make__icontains=query
-        ) | Asset.objects.filter(
-            model__icontains=query
-        ) | Asset.objects.filter(
-            vin__icontains=query
-        )
-    else:
-        results = Asset.objects.none()
+
+    # Ranked asset ids from the search index, paginated before loading any assets
+    page = await aget_page(search_assets(query), request.GET.get("page"), 20)
+
+    assets = await Asset.objects.ain_bulk([match['asset_id'] for match in page])
+    page.object_list = [assets[match['asset_id']] for match in page if match['asset_id'] in assets]
 
     context = {
-        'results': results,
+        'results': page,
         'query': query
     }
 
-    return render(request, 'fleet_manager/search.html', context)
+    return await arender(request, 'fleet_manager/search.html', context)
+
+
+def autocomplete_etag(request):
+    # The URL carries the query, so the index version alone identifies the response
+    autocomplete.index.refresh_if_stale()
+    return autocomplete.index.version
+
+
+@cache_control(max_age=autocomplete.REFRESH_SECONDS)
+@etag(autocomplete_etag)
+def autocomplete_view(request):
+    """Returns VINs, registration and fleet numbers starting with ?q= as JSON.
+
+    Optional parameters: field (vin, reg_no or fleet_no) and limit (at most 50).
+    """
+    field = request.GET.get("field") or None
+    if field is not None and field not in autocomplete.AUTOCOMPLETE_FIELDS:
+        return HttpResponseBadRequest(f"Unknown autocomplete field: {field}")
+    try:
+        limit = min(max(int(request.GET.get("limit", 10)), 1), 50)
+    except ValueError:
+        limit = 10
+
+    matches = autocomplete.index.lookup(request.GET.get("q", ""), limit, field)
+
+    return JsonResponse({
+        "results": [
+            {
+                "value": value,
+                "field": match_field,
+                "asset_id": asset_id,
+                "url": reverse("asset-detail", args=[asset_id]),
+            }
+            for _, match_field, value, asset_id in matches
+        ]
+    })
 
 
 @login_required
@@ -273,67 +336,238 @@ def add_asset(request):
             asset = form.save()
             # ✅ Correct redirect
             return redirect('asset-detail', asset_id=asset.id)
-        else:
-            print(form.errors)  # 🔍 Debugging: Print errors to console
     else:
         form = AssetForm()
 
     return render(request, 'fleet_manager/add_asset_modal.html', {'form': form})
 
 
-def edit_asset_view(request, asset_id):
-    asset = get_object_or_404(Asset, id=asset_id)
+def asset_changes(asset, data):
+    """Returns {field: value} for the submitted editable fields that differ from the asset, raising ValidationError."""
+    changes = {}
+    for name in BULK_EDITABLE_FIELDS:
+        if name in data:
+            value = Asset._meta.get_field(name).clean(data[name], asset)
+            if value != getattr(asset, name):
+                changes[name] = value
+    return changes
+
+
+def save_asset_edit(asset_id, data):
+    """Saves the changed fields of an edit made against ``data['version']``; returns False if the asset has moved on."""
+    with transaction.atomic():
+        # Locked so the version check and the write can't interleave with another edit
+        asset = get_object_or_404(Asset.objects.select_for_update(), id=asset_id)
+        if data.get('version') != str(asset.version):
+            return False
+
+        changes = asset_changes(asset, data)
+        if changes:
+            for name, value in changes.items():
+                setattr(asset, name, value)
+            asset.version += 1
+            asset.save(update_fields=[*changes, 'version', 'updated_at'])
+    return True
 
+
+def edit_asset_view(request, asset_id):
     if request.method == 'POST':
         # Admins can edit the asset
         if request.user.is_superuser:
-            asset.year = request.POST.get('year')
-            asset.make = request.POST.get('make')
-            asset.model = request.POST.get('model')
-            asset.vehicle_type = request.POST.get('vehicle_type')
-            asset.sub_category = request.POST.get('sub_category')
-            asset.classification = request.POST.get('classification')
-            asset.status = request.POST.get('status')
             # VIN is not editable and not included here
-            asset.save()
-            return redirect('asset-detail', asset_id=asset.id)
-
-    context = {'asset': asset}
-    
-    return render(request, 'fleet_manager/asset_screen.html', context)
-
-
-def export_assets(request):
-    """Exports filtered assets to a CSV file based on the vehicle type query parameter."""
-
-    vehicle_type = request.GET.get("vehicle_type", "all")  # Default to "all"
-    filename = "all_assets.csv"
-
-    if vehicle_type == "all":
-        assets = Asset.objects.filter(status="Active")
-    elif vehicle_type == "truck":
-        assets = Asset.objects.filter(vehicle_type="Truck", status="Active")
-        filename = "trucks.csv"
-    elif vehicle_type == "trailer":
-        assets = Asset.objects.filter(vehicle_type="Trailer", status="Active")
-        filename = "trailers.csv"
-    elif vehicle_type == "light":
-        assets = Asset.objects.filter(vehicle_type="Light Vehicle", status="Active")
-        filename = "light_vehicles.csv"
-    elif vehicle_type == "inactive":
-        assets = Asset.objects.filter(status="Inactive")
-        filename = "inactive_assets.csv"
+            try:
+                saved = save_asset_edit(asset_id, request.POST)
+            except ValidationError as e:
+                return render_asset_detail(request, asset_id, status=400, message=" ".join(e.messages))
+            if not saved:
+                return render_asset_detail(request, asset_id, status=409, message=(
+                    "Someone else changed this asset while you were editing it. "
+                    "The latest details are shown below; please make your changes again."))
+            return redirect('asset-detail', asset_id=asset_id)
+
+    return render_asset_detail(request, asset_id)
+
+
+def parse_export_params(params):
+    """Returns (vehicle_type, format, columns) from request parameters, raising ValueError if invalid."""
+    vehicle_type = params.get("vehicle_type", "all")  # Default to "all"
+    export_format = params.get("format", "csv")
+
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format: {export_format}")
+    if export_format == "parquet" and pyarrow is None:
+        raise ValueError("Parquet exports require pyarrow to be installed.")
+
+    return vehicle_type, export_format, parse_columns(params.get("columns"))
+
+
+async def export_assets(request):
+    """Streams filtered assets as CSV, XLSX or Parquet.
+
+    Query parameters: vehicle_type (all, truck, trailer, light, inactive), format
+    (csv, xlsx, parquet) and columns, a comma-separated list of EXPORT_COLUMNS keys.
+
+    Under ASGI the response is an async iterator, so a long export holds no
+    worker thread while it waits on the database. WSGI servers can only consume
+    sync iterators, so they get the sync generator as before.
+    """
+    try:
+        vehicle_type, export_format, columns = parse_export_params(request.GET)
+    except ValueError as e:
+        return HttpResponseBadRequest(str(e))
+
+    assets, filename = assets_for_export(vehicle_type)
+    writer, content_type, extension = EXPORT_FORMATS[export_format]
+
+    if not isinstance(request, ASGIRequest):
+        content = writer(columns, export_chunks(assets, columns))
+    elif export_format in ASYNC_EXPORT_WRITERS:
+        content = ASYNC_EXPORT_WRITERS[export_format](columns, aexport_chunks(assets, columns))
     else:
-        assets = Asset.objects.filter(status="Active")
+        content = aiterate(writer(columns, export_chunks(assets, columns)))
+
+    response = StreamingHttpResponse(content, content_type=content_type)
+    response["Content-Disposition"] = f'attachment; filename="{filename}.{extension}"'
+
+    return response
+
+
+# Page sizes of the JSON asset API
+API_DEFAULT_LIMIT = 100
+API_MAX_LIMIT = 1000
+
+
+@gzip_page
+def api_assets(request):
+    """Read-only JSON pages of assets for machine clients.
+
+    Query parameters: type (all, truck, trailer, light, inactive, as in the list
+    views), fields (comma-separated EXPORT_COLUMNS keys; id is always included),
+    limit (at most API_MAX_LIMIT) and cursor (taken from the previous page's
+    "next" link). Rows are arrays in "fields" order. Each page takes at most
+    three queries, and none of them counts the whole fleet.
+    """
+    asset_type = request.GET.get("type", "all")
+    if asset_type not in ASSET_FILTERS:
+        return JsonResponse({"error": f"Unknown asset type: {asset_type}"}, status=400)
+    try:
+        columns = parse_columns(request.GET.get("fields"))
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    try:
+        limit = int(request.GET.get("limit", API_DEFAULT_LIMIT))
+    except ValueError:
+        limit = 0
+    if not 1 <= limit <= API_MAX_LIMIT:
+        return JsonResponse({"error": f"limit must be between 1 and {API_MAX_LIMIT}"}, status=400)
+    position = read_cursor(request.GET.get("cursor"))
+    if request.GET.get("cursor") and "after" not in position:
+        return JsonResponse({"error": "Invalid cursor"}, status=400)
+
+    columns = ["id"] + [column for column in columns if column != "id"]
+    assets, _ = assets_for_export(asset_type)
+    # One chunk of limit + 1 rows tells whether there is a next page
+    rows = next(export_chunks(assets, columns, limit + 1, position.get("after", 0)), [])
+
+    next_url = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        params = request.GET.copy()
+        params["cursor"] = make_cursor(after=rows[-1][0])
+        next_url = request.build_absolute_uri(f"?{params.urlencode()}")
+
+    return JsonResponse(
+        {"fields": columns, "results": rows, "next": next_url},
+        json_dumps_params=COMPACT_JSON,
+    )
+
+
+@require_POST
+def api_assets_bulk(request):
+    """Applies a JSON batch of asset edits: {"items": [{"vin": ..., "status": "Inactive"}, ...]}.
+
+    Admins only. Responds with one result per item; if any item is invalid the
+    response is a 400 and no asset is changed.
+    """
+    if not request.user.is_superuser:
+        return JsonResponse({"error": "Only admins can edit assets."}, status=403)
+    try:
+        items = json.loads(request.body)["items"]
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({"error": 'Expected a JSON object with an "items" list.'}, status=400)
+    if not isinstance(items, list):
+        return JsonResponse({"error": '"items" must be a list.'}, status=400)
+
+    try:
+        results = bulk_edit_assets(items)
+    except BulkEditError as e:
+        return JsonResponse({"results": e.results}, status=400, json_dumps_params=COMPACT_JSON)
+    return JsonResponse({"results": results}, json_dumps_params=COMPACT_JSON)
+
+
+@login_required
+@require_POST
+def create_export_job(request):
+    """Queues an export as a django_q task and redirects to its progress page."""
+    try:
+        vehicle_type, export_format, columns = parse_export_params(request.POST)
+    except ValueError as e:
+        return HttpResponseBadRequest(str(e))
+
+    job = ExportJob.objects.create(
+        vehicle_type=vehicle_type,
+        export_format=export_format,
+        columns=",".join(columns),
+        created_by=request.user,
+    )
+    async_task("fleet_manager.tasks.run_export_job", str(job.pk),
+               hook="fleet_manager.tasks.export_job_done", timeout=EXPORT_JOB_TIMEOUT)
 
-    # Create CSV response
-    response = HttpResponse(content_type="text/csv")
-    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return redirect("export_job", job_id=job.pk)
 
-    writer = csv.writer(response)
-    writer.writerow(["Make", "Model", "Year", "Type", "Status"])
 
-    for asset in assets:
-        writer.writerow([asset.make, asset.model, asset.year, asset.vehicle_type, asset.status])
+def get_own_export_job(request, job_id):
+    """Returns the user's export job; other users' jobs are a 404, as if they didn't exist."""
+    return get_object_or_404(ExportJob, pk=job_id, created_by=request.user)
 
-    return response
\ No newline at end of file
+
+@login_required
+def export_job(request, job_id):
+    job = get_own_export_job(request, job_id)
+    return render(request, "fleet_manager/export_job.html", {"job": job})
+
+
+@login_required
+def export_job_status(request, job_id):
+    """Returns the job's progress as JSON for the progress page to poll."""
+    job = get_own_export_job(request, job_id)
+    return JsonResponse({
+        "status": job.status,
+        "rows_written": job.rows_written,
+        "total_rows": job.total_rows,
+        "progress": job.progress,
+        "error": job.error,
+        "download_url": reverse("export_job_download", args=[job.pk]) if job.status == "Done" else None,
+    })
+
+
+@login_required
+def export_job_download(request, job_id):
+    job = get_own_export_job(request, job_id)
+    if job.status != "Done" or not job.file:
+        raise Http404("This export is not ready yet.")
+    return FileResponse(job.file.open("rb"), as_attachment=True,
+                        filename=job.file.name.rsplit("/", 1)[-1])
+
+
+@cache_control(public=True, max_age=AVATAR_CACHE_SECONDS, immutable=True)
+def avatar_file(request, name):
+    """Serves an avatar thumbnail; names are content hashes, so browsers may keep it for a year."""
+    match = AVATAR_NAME_RE.fullmatch(name)
+    if match is None:
+        raise Http404("No such avatar.")
+    try:
+        file = default_storage.open(AVATAR_DIR + name)
+    except FileNotFoundError:
+        raise Http404("No such avatar.")
+    return FileResponse(file, content_type=AVATAR_CONTENT_TYPES[match[1]])